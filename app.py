@@ -1,29 +1,135 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
 from pydantic import BaseModel, Field
+import asyncio
 import asyncpg
+import logging
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import timedelta
-from typing import Optional, List
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from typing import Optional, List, Literal
+from auth import (
+    cache_tokens,
+    get_current_user,
+    get_password_hash_async,
+    get_token_payload,
+    hash_pool,
+    revogacoes,
+    verify_and_update_password_async,
+)
+from banco import DB_CONFIG, PoolBanco, PoolLeitura
+from sessoes import abrir_sessao, renovar_sessao, revogar_sessao, revogar_sessoes
+from cache import CacheTTL
+from metricas import MiddlewareMetricas, registrar_coletor
+from busca import (
+    CANAL_PRODUTOS_ATUALIZADOS,
+    LIMITE_MAXIMO,
+    LIMITE_PADRAO,
+    MEDIA_TYPE_NDJSON,
+    decodificar_cursor,
+    escolher_plano,
+    formatar_grupo,
+    formatar_produto,
+    montar_consulta,
+    montar_consulta_agrupada,
+    normalizar_termo,
+    paginar,
+    consultas_busca_quentes,
+    transmitir_produtos,
+)
 from fastapi import Form
 
 # Teste de pipeline CI - gatilho novamente
 
 
-# --- Configuração do DB ---
-db_pool = None
+# --- Configuração do DB (variáveis DB_*, ver banco.py) ---
+# O comentário inicial dá nome à consulta nas métricas (metricas.py)
+SQL_USUARIO_POR_ID = "/* usuario_por_id */ SELECT id FROM usuarios WHERE id = $1"
+SQL_USUARIO_POR_EMAIL = "/* usuario_por_email */ SELECT id FROM usuarios WHERE email = $1"
+SQL_LOGIN = "/* login */ SELECT id, senha FROM usuarios WHERE email = $1"
+
+# Preparadas em cada conexão nova do pool; os argumentos não encontram nada
+CONSULTAS_QUENTES = [
+    (SQL_USUARIO_POR_ID, [0]),
+    (SQL_USUARIO_POR_EMAIL, [""]),
+    (SQL_LOGIN, [""]),
+    *consultas_busca_quentes(),
+]
+db_pool = PoolBanco(CONSULTAS_QUENTES)
+# Rotas só de leitura: réplica (DB_REPLICA_DSN) quando em dia, senão o próprio db_pool
+db_leitura = PoolLeitura(db_pool, PoolBanco(CONSULTAS_QUENTES, nome="replica"))
+
+# --- Cache da busca pública ---
+CACHE_BUSCA_MAX_ITENS = 1024
+CACHE_BUSCA_TTL = 60.0  # segundos
+cache_busca = CacheTTL(max_itens=CACHE_BUSCA_MAX_ITENS, ttl=CACHE_BUSCA_TTL)
+
+# --- Cache de resolução de usuários (token -> id) ---
+CACHE_USUARIOS_MAX_ITENS = 4096
+CACHE_USUARIOS_TTL = 300.0  # segundos
+cache_usuarios = CacheTTL(max_itens=CACHE_USUARIOS_MAX_ITENS, ttl=CACHE_USUARIOS_TTL)
+
+
+# Espera entre tentativas de reabrir a conexão do LISTEN (segundos)
+ESPERA_RECONEXAO_LISTEN = 2.0
+
+
+# Prefixo do payload que invalida um usuário nos outros workers (ver publicar_invalidacao_usuario)
+PREFIXO_NOTIFY_USUARIO = "usuario:"
+
+
+def _invalidar_cache_busca(conn, pid, canal, payload):
+    """Listener do NOTIFY: scrapers gravaram produtos (payload = origem) ou um usuário mudou."""
+    if payload.startswith(PREFIXO_NOTIFY_USUARIO):
+        usuario_id, _, email = payload[len(PREFIXO_NOTIFY_USUARIO):].partition(":")
+        invalidar_cache_usuario(int(usuario_id), email)
+    else:
+        cache_busca.invalidar()
+
+
+async def escutar_invalidacoes():
+    """Mantém a conexão dedicada ao LISTEN aberta, reconectando quando ela cai."""
+    while True:
+        try:
+            conn = await asyncpg.connect(**DB_CONFIG)
+        except Exception as e:
+            logging.warning("LISTEN de invalidação sem conexão (%r); nova tentativa em %ss.", e, ESPERA_RECONEXAO_LISTEN)
+            await asyncio.sleep(ESPERA_RECONEXAO_LISTEN)
+            continue
+
+        perdida = asyncio.Event()
+        conn.add_termination_listener(lambda _conn: perdida.set())
+        try:
+            await conn.add_listener(CANAL_PRODUTOS_ATUALIZADOS, _invalidar_cache_busca)
+            # NOTIFYs enviados enquanto a conexão estava fora se perderam
+            cache_busca.invalidar()
+            cache_usuarios.invalidar()
+            await perdida.wait()
+            logging.warning("Conexão do LISTEN de invalidação caiu; reconectando.")
+        except Exception as e:
+            logging.warning("Falha no LISTEN de invalidação (%r); reconectando.", e)
+            await asyncio.sleep(ESPERA_RECONEXAO_LISTEN)
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+
 
 async def lifespan(app: FastAPI):
-    global db_pool
-    db_pool = await asyncpg.create_pool(
-        user='postgres',
-        password='0608',
-        database='hunter_db',
-        host='localhost',
-        port=5432
+    # Séries dos pools e caches em GET /metrics
+    registrar_coletor(
+        pools={"primario": db_pool, **({"replica": db_leitura.replica} if db_leitura.replica else {})},
+        caches={"busca": cache_busca, "usuarios": cache_usuarios, "tokens": cache_tokens},
     )
+    await db_pool.abrir()
+    await db_leitura.abrir()
+    await revogacoes.iniciar(db_pool)
+    # Conexão dedicada ao LISTEN: os scrapers rodam em outros processos
+    listener = asyncio.create_task(escutar_invalidacoes())
     yield
-    await db_pool.close()
+    listener.cancel()
+    revogacoes.encerrar()
+    await db_leitura.fechar()
+    await db_pool.fechar()
+    hash_pool.encerrar()
 
 app = FastAPI(
     title="Hunter API",
@@ -48,13 +154,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Plano-Busca"],
 )
+app.add_middleware(MiddlewareMetricas)
 
 # --- Dependência DB ---
 async def get_db():
     async with db_pool.acquire() as conn:
         yield conn
 
+async def get_db_leitura():
+    """Conexão para rotas que só leem: réplica se estiver em dia, senão primário"""
+    async with db_leitura.acquire() as conn:
+        yield conn
+
+# --- Dependência de usuário autenticado ---
+def _chaves_cache_usuario(usuario_id: int, email: str) -> tuple:
+    # Tokens novos trazem o id (uid); tokens antigos só o e-mail
+    return ("uid", usuario_id), ("email", email)
+
+def invalidar_cache_usuario(usuario_id: int, email: str) -> None:
+    for chave in _chaves_cache_usuario(usuario_id, email):
+        cache_usuarios.pop(chave)
+
+async def publicar_invalidacao_usuario(conn, usuario_id: int, email: str) -> None:
+    """Invalida o usuário neste processo e, pelo NOTIFY, nos demais workers"""
+    invalidar_cache_usuario(usuario_id, email)
+    await conn.execute(
+        "SELECT pg_notify($1, $2)", CANAL_PRODUTOS_ATUALIZADOS, f"{PREFIXO_NOTIFY_USUARIO}{usuario_id}:{email}"
+    )
+
+async def get_usuario_id(payload: dict = Depends(get_token_payload)) -> int:
+    """Retorna o id do usuário autenticado sem ir ao banco quando ele já está em cache"""
+    uid = payload.get("uid")
+    chave = ("uid", uid) if uid is not None else ("email", payload["sub"])
+
+    usuario_id = cache_usuarios.get(chave)
+    if usuario_id is None:
+        async with db_pool.acquire() as conn:
+            if uid is not None:
+                usuario_id = await conn.fetchval(SQL_USUARIO_POR_ID, uid)
+            else:
+                usuario_id = await conn.fetchval(SQL_USUARIO_POR_EMAIL, payload["sub"])
+        if not usuario_id:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+        cache_usuarios.set(chave, usuario_id)
+    return usuario_id
+
 # --- Models (entrada) ---
 class Usuario(BaseModel):
     nome: str
@@ -92,6 +238,9 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 
 # --- Endpoints ---
 
@@ -99,7 +248,7 @@ class LoginRequest(BaseModel):
 @app.post("/cadastrar", tags=["Usuários"])
 async def cadastrar_usuario(usuario: Usuario, conn=Depends(get_db)):
     try:
-        senha_hash = get_password_hash(usuario.senha)
+        senha_hash = await get_password_hash_async(usuario.senha)
         query = "INSERT INTO usuarios (nome, email, senha) VALUES ($1, $2, $3) RETURNING id"
         user_id = await conn.fetchval(query, usuario.nome, usuario.email, senha_hash)
         return {"message": "Usuário cadastrado com sucesso!", "usuario_id": user_id}
@@ -125,17 +274,21 @@ async def login(
         if not email or not senha:
             raise HTTPException(status_code=400, detail="Credenciais não informadas.")
 
-        row = await conn.fetchrow("SELECT senha FROM usuarios WHERE email = $1", email)
+        row = await conn.fetchrow(SQL_LOGIN, email)
         if not row:
             raise HTTPException(status_code=400, detail="Usuário não encontrado")
 
-        if not verify_password(senha, row["senha"]):
+        valida, novo_hash = await verify_and_update_password_async(senha, row["senha"])
+        if not valida:
             raise HTTPException(status_code=400, detail="Senha incorreta")
 
-        access_token = create_access_token(
-            data={"sub": email}, expires_delta=timedelta(minutes=60)
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
+        # Hash gerado com custo antigo (BCRYPT_ROUNDS mudou): regrava com o custo atual
+        if novo_hash:
+            await conn.execute("UPDATE usuarios SET senha = $1 WHERE id = $2", novo_hash, row["id"])
+
+        tokens = await abrir_sessao(conn, row["id"], email)
+        cache_usuarios.set(("uid", row["id"]), row["id"])
+        return tokens
 
     except HTTPException:
         raise
@@ -143,13 +296,29 @@ async def login(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/token/refresh", tags=["Usuários"])
+async def renovar_token(dados: RefreshRequest, conn=Depends(get_db)):
+    """Troca o refresh token por um novo par (o refresh token anterior deixa de valer)"""
+    return await renovar_sessao(conn, dados.refresh_token)
+
+
+@app.post("/logout", tags=["Usuários"])
+async def logout(payload: dict = Depends(get_token_payload), conn=Depends(get_db)):
+    """Revoga a sessão do token: access e refresh token deixam de valer"""
+    # Tokens emitidos antes das sessões não têm sid; expiram sozinhos
+    if payload.get("sid") is not None:
+        await revogar_sessao(conn, payload["sid"], "logout")
+    return {"message": "Sessão encerrada."}
+
+
 # DELETE usuário (cascateia alertas/feedbacks pelo FK ON DELETE CASCADE)
 @app.delete("/usuario", tags=["Usuários"])
-async def deletar_usuario(user_email: str = Depends(get_current_user), conn=Depends(get_db)):
+async def deletar_usuario(usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     try:
-        result = await conn.execute("DELETE FROM usuarios WHERE email = $1", user_email)
-        if result == "DELETE 0":
+        email = await conn.fetchval("DELETE FROM usuarios WHERE id = $1 RETURNING email", usuario_id)
+        if email is None:
             raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+        await publicar_invalidacao_usuario(conn, usuario_id, email)
         return {"message": "Usuário deletado com sucesso!"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -159,15 +328,12 @@ async def deletar_usuario(user_email: str = Depends(get_current_user), conn=Depe
 @app.put("/usuario", tags=["Usuários"])
 async def atualizar_usuario(
     dados: UsuarioUpdate,
+    usuario_id: int = Depends(get_usuario_id),
     user_email: str = Depends(get_current_user),
+    payload: dict = Depends(get_token_payload),
     conn=Depends(get_db)
 ):
     try:
-        # Buscar o ID do usuário autenticado
-        usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
-        if not usuario_id:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-
         campos = []
         valores = []
 
@@ -180,7 +346,7 @@ async def atualizar_usuario(
             valores.append(dados.email)
         if dados.senha:
             campos.append(f"senha = ${len(valores)+1}")
-            valores.append(get_password_hash(dados.senha))
+            valores.append(await get_password_hash_async(dados.senha))
 
         if not campos:
             raise HTTPException(status_code=400, detail="Nenhum campo para atualizar.")
@@ -188,10 +354,16 @@ async def atualizar_usuario(
         query = f"UPDATE usuarios SET {', '.join(campos)} WHERE id = ${len(valores)+1}"
         valores.append(usuario_id)
 
-        result = await conn.execute(query, *valores)
-        if result == "UPDATE 0":
-            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+        async with conn.transaction():
+            result = await conn.execute(query, *valores)
+            if result == "UPDATE 0":
+                raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+            # Troca de senha encerra as outras sessões; a atual continua valendo
+            if dados.senha:
+                await revogar_sessoes(conn, usuario_id, "senha", exceto=payload.get("sid"))
 
+        # O e-mail antigo deixa de resolver para este usuário
+        await publicar_invalidacao_usuario(conn, usuario_id, user_email)
         return {"message": "Usuário atualizado com sucesso!"}
 
     except Exception as e:
@@ -200,12 +372,8 @@ async def atualizar_usuario(
 
 # Feedback
 @app.post("/feedback", tags=["Feedback"])
-async def enviar_feedback(feedback: Feedback, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
+async def enviar_feedback(feedback: Feedback, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     try:
-        usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
-        if not usuario_id:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
         query = "INSERT INTO feedbacks (usuario_id, nome, email, feedback) VALUES ($1, $2, $3, $4)"
         await conn.execute(query, usuario_id, feedback.nome, feedback.email, feedback.feedback)
         return {"message": "Feedback enviado com sucesso!"}
@@ -213,14 +381,12 @@ async def enviar_feedback(feedback: Feedback, user_email: str = Depends(get_curr
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/feedbacks", tags=["Feedback"])
-async def listar_feedbacks(user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
+async def listar_feedbacks(usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db_leitura)):
     rows = await conn.fetch("SELECT id, feedback, data_envio FROM feedbacks WHERE usuario_id = $1 ORDER BY id DESC", usuario_id)
     return [{"id": r["id"], "feedback": r["feedback"], "data_envio": r["data_envio"]} for r in rows]
 
 @app.put("/feedback/{feedback_id}", tags=["Feedback"])
-async def atualizar_feedback(feedback_id: int, novo: FeedbackUpdate, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
+async def atualizar_feedback(feedback_id: int, novo: FeedbackUpdate, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     result = await conn.execute(
         "UPDATE feedbacks SET feedback = $1 WHERE id = $2 AND usuario_id = $3",
         novo.feedback, feedback_id, usuario_id
@@ -230,8 +396,7 @@ async def atualizar_feedback(feedback_id: int, novo: FeedbackUpdate, user_email:
     return {"message": "Feedback atualizado com sucesso!"}
 
 @app.delete("/feedback/{feedback_id}", tags=["Feedback"])
-async def deletar_feedback(feedback_id: int, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
+async def deletar_feedback(feedback_id: int, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     result = await conn.execute("DELETE FROM feedbacks WHERE id = $1 AND usuario_id = $2", feedback_id, usuario_id)
     if result == "DELETE 0":
         raise HTTPException(status_code=404, detail="Feedback não encontrado ou não pertence a este usuário.")
@@ -239,12 +404,8 @@ async def deletar_feedback(feedback_id: int, user_email: str = Depends(get_curre
 
 # Alertas de preço
 @app.post("/alerta-preco", tags=["Alertas"])
-async def criar_alerta(alerta: AlertaPreco, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
+async def criar_alerta(alerta: AlertaPreco, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     try:
-        usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
-        if not usuario_id:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
         query = "INSERT INTO alertas_preco (usuario_id, produto, preco) VALUES ($1, $2, $3)"
         await conn.execute(query, usuario_id, alerta.produto, alerta.preco)
         return {"message": "Alerta de preço criado com sucesso!"}
@@ -252,8 +413,7 @@ async def criar_alerta(alerta: AlertaPreco, user_email: str = Depends(get_curren
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/alertas", tags=["Alertas"])
-async def listar_alertas(user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
+async def listar_alertas(usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db_leitura)):
     rows = await conn.fetch(
         "SELECT id, produto, preco, created_at FROM alertas_preco WHERE usuario_id = $1 ORDER BY id DESC",
         usuario_id
@@ -261,9 +421,7 @@ async def listar_alertas(user_email: str = Depends(get_current_user), conn=Depen
     return [{"id": r["id"], "produto": r["produto"], "preco": r["preco"], "data": r["created_at"]} for r in rows]
 
 @app.put("/alerta/{alerta_id}", tags=["Alertas"])
-async def atualizar_alerta(alerta_id: int, alerta: AlertaPrecoUpdate, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
-
+async def atualizar_alerta(alerta_id: int, alerta: AlertaPrecoUpdate, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     campos = []
     valores = []
     if alerta.produto is not None:
@@ -285,13 +443,39 @@ async def atualizar_alerta(alerta_id: int, alerta: AlertaPrecoUpdate, user_email
     return {"message": "Alerta atualizado com sucesso!"}
 
 @app.delete("/alerta/{alerta_id}", tags=["Alertas"])
-async def deletar_alerta(alerta_id: int, user_email: str = Depends(get_current_user), conn=Depends(get_db)):
-    usuario_id = await conn.fetchval("SELECT id FROM usuarios WHERE email = $1", user_email)
+async def deletar_alerta(alerta_id: int, usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db)):
     result = await conn.execute("DELETE FROM alertas_preco WHERE id = $1 AND usuario_id = $2", alerta_id, usuario_id)
     if result == "DELETE 0":
         raise HTTPException(status_code=404, detail="Alerta não encontrado ou não pertence ao usuário.")
     return {"message": "Alerta deletado com sucesso!"}
 
+@app.get("/notificacoes", tags=["Alertas"])
+async def listar_notificacoes(usuario_id: int = Depends(get_usuario_id), conn=Depends(get_db_leitura)):
+    rows = await conn.fetch(
+        """
+        SELECT n.id, n.alerta_id, a.produto AS termo, n.origem, n.produto_id, n.preco, n.lida, n.criado_em
+        FROM notificacoes_alerta n
+        JOIN alertas_preco a ON a.id = n.alerta_id
+        WHERE n.usuario_id = $1
+        ORDER BY n.id DESC
+        LIMIT 100
+        """,
+        usuario_id
+    )
+    return [
+        {
+            "id": r["id"],
+            "alerta_id": r["alerta_id"],
+            "termo": r["termo"],
+            "origem": r["origem"],
+            "produto_id": r["produto_id"],
+            "preco": r["preco"],
+            "lida": r["lida"],
+            "data": r["criado_em"],
+        }
+        for r in rows
+    ]
+
 # Produtos (busca combinada Kabum + Mercado Livre)
 @app.get(
     "/buscar-produtos",
@@ -299,73 +483,176 @@ async def deletar_alerta(alerta_id: int, user_email: str = Depends(get_current_u
     summary="Busca pública de produtos",
     description=(
         "🔎 Rota **pública** — pode ser acessada por qualquer visitante, mesmo sem autenticação. "
-        "Realiza uma busca combinada de produtos nas tabelas **produtos_kabum** e **produtos_mercadolivre**, "
-        "ordenando os resultados do menor para o maior preço."
+        "Realiza uma busca combinada dos produtos da **Kabum** e do **Mercado Livre** (tabela **produtos_busca**), "
+        "ordenando os resultados do menor para o maior preço. A busca usa full-text em português "
+        "e trigramas sem acentos; termos com menos de 3 caracteres usam busca por substring. "
+        "O campo `plano` da resposta informa qual estratégia foi usada. "
+        "Os resultados são paginados: use `limit` e repasse o `next_cursor` recebido em `cursor`. "
+        "Com o header `Accept: application/x-ndjson` a resposta é transmitida em NDJSON (um produto por linha) "
+        "à medida que as linhas saem do banco; nesse modo `limit` é opcional e, se houver mais resultados, "
+        "a última linha é `{\"next_cursor\": ...}` (ordem por preço). "
+        "Com `agrupar=true` o mesmo produto vendido em várias lojas vira um único resultado "
+        "(`grupos`), com o menor preço de cada loja e todas as ofertas encontradas. "
+        "Com `imagens=false` a galeria de imagens fica fora da resposta (a imagem principal continua). "
+        "Respostas JSON ficam em cache por alguns segundos e são invalidadas quando os scrapers gravam produtos."
     ),
 )
-async def buscar_produtos(nome: str, conn=Depends(get_db)):
+async def buscar_produtos(
+    request: Request,
+    nome: str,
+    modo: Literal["auto", "fts", "substring"] = Query(
+        "auto", description="Plano de busca: 'auto' usa full-text/trigramas e cai para substring em termos curtos."
+    ),
+    ordem: Literal["preco", "relevancia"] = Query("preco", description="Ordenação dos resultados."),
+    limit: Optional[int] = Query(
+        None, ge=1, le=LIMITE_MAXIMO, description=f"Quantidade máxima de produtos por página (padrão {LIMITE_PADRAO})."
+    ),
+    cursor: Optional[str] = Query(None, description="Valor de `next_cursor` da página anterior (apenas ordem por preço)."),
+    agrupar: bool = Query(False, description="Um resultado por produto, com os preços de cada loja."),
+    imagens: bool = Query(True, description="Incluir a galeria (`imagens_urls`) de cada produto; `false` reduz a resposta."),
+):
     try:
-        query = """
-            SELECT
-                id,
-                nome,
-                preco,
-                link,
-                imagem_url,
-                imagens_urls,
-                origem
-            FROM (
-                SELECT
-                    id,
-                    nome,
-                    preco,
-                    link,
-                    imagem_url,
-                    imagens_urls,
-                    'Kabum' AS origem
-                FROM produtos_kabum
-                WHERE nome ILIKE $1
-                UNION ALL
-                SELECT
-                    id,
-                    nome,
-                    preco,
-                    link,
-                    imagem_url,
-                    NULL as imagens_urls,
-                    'Mercado Livre' AS origem
-                FROM produtos_mercadolivre
-                WHERE nome ILIKE $1
-            ) AS resultados
-            ORDER BY preco ASC
-        """
-        rows = await conn.fetch(query, f"%{nome}%")
-        
-        import json
-        produtos = []
-        for r in rows:
-            # Parse imagens_urls de JSON para lista
-            imagens_list = []
-            if r["imagens_urls"]:
-                try:
-                    imagens_list = json.loads(r["imagens_urls"])
-                except:
-                    pass
-            
-            produtos.append({
-                "id": str(r["id"]),
-                "nome": r["nome"],
-                "preco": float(r["preco"]),
-                "link": r["link"],
-                "imagem_url": r["imagem_url"],
-                "imagens_urls": imagens_list,
-                "origem": r["origem"],
-            })
-        
-        if not produtos:
+        termo = normalizar_termo(nome)
+        if not termo:
+            raise HTTPException(status_code=400, detail="Informe um termo de busca.")
+
+        posicao = None
+        if cursor:
+            if ordem != "preco":
+                raise HTTPException(status_code=400, detail="Cursor disponível apenas na ordem por preço.")
+            try:
+                posicao = decodificar_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        plano = escolher_plano(termo, modo)
+
+        if MEDIA_TYPE_NDJSON in request.headers.get("accept", ""):
+            if agrupar:
+                raise HTTPException(status_code=400, detail="A busca agrupada não está disponível em NDJSON.")
+            query, args = montar_consulta(termo, plano, ordem, limit, posicao, imagens)
+            return StreamingResponse(
+                transmitir_produtos(db_leitura, query, args, limit, imagens, ordem),
+                media_type=MEDIA_TYPE_NDJSON,
+                headers={"X-Plano-Busca": plano},
+            )
+
+        limit = limit or LIMITE_PADRAO
+
+        if agrupar:
+            async def carregar_grupos():
+                query, args = montar_consulta_agrupada(termo, plano, ordem, limit, posicao)
+                async with db_leitura.acquire() as conn:
+                    rows = await conn.fetch(query, *args)
+                pagina, next_cursor = paginar(rows, limit, ordem)
+                return [formatar_grupo(r) for r in pagina], next_cursor
+
+            chave = ("grupos", termo, plano, ordem, limit, cursor)
+            grupos, next_cursor = await cache_busca.obter_ou_carregar(chave, carregar_grupos)
+            if not grupos and not cursor:
+                raise HTTPException(status_code=404, detail="Nenhum produto encontrado")
+            return {"grupos": grupos, "plano": plano, "next_cursor": next_cursor}
+
+        async def carregar():
+            query, args = montar_consulta(termo, plano, ordem, limit, posicao, imagens)
+            async with db_leitura.acquire() as conn:
+                rows = await conn.fetch(query, *args)
+            pagina, next_cursor = paginar(rows, limit, ordem)
+            return [formatar_produto(r, imagens) for r in pagina], next_cursor
+
+        chave = (termo, plano, ordem, limit, cursor, imagens)
+        produtos, next_cursor = await cache_busca.obter_ou_carregar(chave, carregar)
+        if not produtos and not cursor:
             raise HTTPException(status_code=404, detail="Nenhum produto encontrado")
-        return {"produtos": produtos}
+        return {"produtos": produtos, "plano": plano, "next_cursor": next_cursor}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# Histórico de preços
+INTERVALOS_HISTORICO = {"hora": "hour", "dia": "day", "semana": "week", "mes": "month"}
+
+@app.get(
+    "/produto/{produto_id}/historico",
+    tags=["Produtos"],
+    summary="Histórico de preços de um produto",
+    description=(
+        "Rota **pública**. Retorna a série de preços do produto agregada por período "
+        "(mínimo, máximo, médio e último preço observado em cada intervalo)."
+    ),
+)
+async def historico_produto(
+    produto_id: int,
+    origem: Literal["kabum", "mercadolivre"] = Query(..., description="Loja do produto."),
+    intervalo: Literal["hora", "dia", "semana", "mes"] = Query("dia", description="Tamanho de cada ponto da série."),
+    dias: int = Query(90, ge=1, le=3650, description="Quantos dias para trás considerar."),
+    conn=Depends(get_db_leitura),
+):
+    rows = await conn.fetch(
+        """
+        SELECT date_trunc($3, observado_em) AS periodo,
+               MIN(preco) AS minimo,
+               MAX(preco) AS maximo,
+               ROUND(AVG(preco), 2) AS medio,
+               (ARRAY_AGG(preco ORDER BY observado_em DESC))[1] AS ultimo,
+               COUNT(*) AS observacoes
+        FROM historico_precos
+        WHERE origem = $1
+          AND produto_id = $2
+          AND observado_em >= NOW() - make_interval(days => $4)
+        GROUP BY 1
+        ORDER BY 1
+        """,
+        origem, produto_id, INTERVALOS_HISTORICO[intervalo], dias
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="Nenhum histórico encontrado para este produto.")
+    return {
+        "produto_id": produto_id,
+        "origem": origem,
+        "intervalo": intervalo,
+        "serie": [
+            {
+                "periodo": r["periodo"],
+                "minimo": float(r["minimo"]),
+                "maximo": float(r["maximo"]),
+                "medio": float(r["medio"]),
+                "ultimo": float(r["ultimo"]),
+                "observacoes": r["observacoes"],
+            }
+            for r in rows
+        ],
+    }
+
+@app.get("/buscar-produtos/cache", tags=["Produtos"], summary="Estatísticas do cache da busca")
+async def estatisticas_cache_busca():
+    return cache_busca.estatisticas()
+
+
+@app.get("/status/hash", include_in_schema=False)
+async def estatisticas_hash():
+    return hash_pool.estatisticas()
+
+
+@app.get("/status/auth", include_in_schema=False)
+async def estatisticas_auth():
+    return {"cache_tokens": cache_tokens.estatisticas(), "revogacao": revogacoes.estatisticas()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def prontidao():
+    """Pronto quando o banco responde; traz a ocupação do pool e das conexões do Postgres."""
+    try:
+        banco = await db_pool.verificar()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Banco de dados indisponível: {e}")
+    return {"status": "ok", "pool": db_pool.estatisticas(), "banco": banco, "replica": db_leitura.estatisticas()}
@@ -4,14 +4,54 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import logging
+import os
+import time
+
+from cache import CacheTTL
 
 # --- Configurações JWT ---
 SECRET_KEY = "chave_super_secreta_hunter_2025"  # Troque por uma chave segura e longa!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# --- Rotação de chaves (kid) ---
+# JWT_KEYS="kid1:segredo1,kid2:segredo2": tokens novos são assinados com JWT_KID_ATIVO
+# e os demais kids seguem aceitos até os tokens emitidos com eles expirarem.
+# Tokens sem kid (emitidos antes da rotação) são verificados com SECRET_KEY enquanto
+# ela estiver entre as chaves de JWT_KEYS; tirada de lá, eles deixam de valer.
+def _ler_chaves(valor: str | None) -> dict[str, str]:
+    if not valor:
+        return {"hunter-2025": SECRET_KEY}
+    chaves = {}
+    for par in valor.split(","):
+        kid, _, segredo = par.strip().partition(":")
+        if kid and segredo:
+            chaves[kid] = segredo
+    return chaves
+
+JWT_KEYS = _ler_chaves(os.getenv("JWT_KEYS"))
+JWT_KID_ATIVO = os.getenv("JWT_KID_ATIVO", next(iter(JWT_KEYS)))
+if JWT_KID_ATIVO not in JWT_KEYS:
+    raise RuntimeError(f"JWT_KID_ATIVO={JWT_KID_ATIVO!r} não está em JWT_KEYS")
+CHAVE_SEM_KID = SECRET_KEY if SECRET_KEY in JWT_KEYS.values() else None
+
+# --- Cache de tokens verificados ---
+# Token já validado (assinatura + exp) é aceito sem refazer o decode até o seu exp
+JWT_CACHE_MAX_ITENS = int(os.getenv("JWT_CACHE_MAX_ITENS", "10000"))
+
 # --- Contexto de criptografia (hash de senha) ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Alterar BCRYPT_ROUNDS faz os hashes antigos serem refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# --- Pool de hashing (bcrypt fora do event loop) ---
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # "thread" ou "process"
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Requisições esperando além disso recebem 503 em vez de acumular latência
+HASH_MAX_FILA = int(os.getenv("HASH_MAX_FILA", "256"))
 
 # --- Configuração OAuth2 ---
 # O parâmetro tokenUrl deve coincidir exatamente com o endpoint de login da sua API
@@ -26,28 +66,221 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Compara a senha digitada com o hash armazenado"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Compara a senha e, se o hash usar parâmetros antigos, devolve um hash novo"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# --- Versões assíncronas (executam no pool de hashing) ---
+class _PoolHash:
+    """Executor limitado para bcrypt, com métricas de fila"""
+
+    def __init__(self):
+        self._executor: Executor | None = None
+        self._semaforo: asyncio.Semaphore | None = None
+        self.em_execucao = 0
+        self.na_fila = 0
+        self.maior_fila = 0
+        self.total = 0
+        self.rejeitados = 0
+        self.tempo_total = 0.0
+
+    def _iniciar(self) -> None:
+        if HASH_EXECUTOR == "process":
+            self._executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        else:
+            # bcrypt libera o GIL, então threads já usam vários núcleos
+            self._executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+        self._semaforo = asyncio.Semaphore(HASH_WORKERS)
+
+    async def executar(self, func, *args):
+        if self._executor is None:
+            self._iniciar()
+        if self.na_fila >= HASH_MAX_FILA:
+            self.rejeitados += 1
+            raise HTTPException(status_code=503, detail="Servidor ocupado, tente novamente.")
+
+        self.na_fila += 1
+        self.maior_fila = max(self.maior_fila, self.na_fila)
+        try:
+            await self._semaforo.acquire()
+        finally:
+            self.na_fila -= 1
+
+        self.em_execucao += 1
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.tempo_total += time.perf_counter() - inicio
+            self.total += 1
+            self.em_execucao -= 1
+            self._semaforo.release()
+
+    def encerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def estatisticas(self) -> dict:
+        return {
+            "executor": HASH_EXECUTOR,
+            "workers": HASH_WORKERS,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "em_execucao": self.em_execucao,
+            "na_fila": self.na_fila,
+            "maior_fila": self.maior_fila,
+            "max_fila": HASH_MAX_FILA,
+            "total": self.total,
+            "rejeitados": self.rejeitados,
+            "tempo_medio_ms": round(self.tempo_total / self.total * 1000, 2) if self.total else 0.0,
+        }
+
+hash_pool = _PoolHash()
+
+async def get_password_hash_async(password: str) -> str:
+    """Gera o hash da senha sem bloquear o event loop"""
+    return await hash_pool.executar(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verifica a senha sem bloquear o event loop (ver verify_and_update_password)"""
+    return await hash_pool.executar(verify_and_update_password, plain_password, hashed_password)
+
 # --- Função de criação do token JWT ---
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """Cria o token JWT com tempo de expiração"""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    token = jwt.encode(
+        to_encode, JWT_KEYS[JWT_KID_ATIVO], algorithm=ALGORITHM, headers={"kid": JWT_KID_ATIVO}
+    )
     return token
 
-# --- Função que valida o token e retorna o e-mail do usuário logado ---
-def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
-    """Valida o token JWT e retorna o e-mail do usuário autenticado"""
-    credentials_exception = HTTPException(
+# --- Funções que validam o token ---
+def token_invalido() -> HTTPException:
+    """401 do token; uma exceção nova por falha (uma compartilhada acumularia __traceback__)"""
+    return HTTPException(
         status_code=401,
         detail="Token inválido ou expirado",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# O valor é (payload, exp); o TTL do cache só limita a permanência, quem manda é o exp
+cache_tokens = CacheTTL(max_itens=JWT_CACHE_MAX_ITENS, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decodificar_token(token: str) -> dict:
+    """Decode completo pelo python-jose, escolhendo a chave pelo kid do cabeçalho"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        return email
+        kid = jwt.get_unverified_header(token).get("kid")
+        chave = JWT_KEYS.get(kid) if kid is not None else CHAVE_SEM_KID
+        if chave is None:
+            raise token_invalido()
+        payload = jwt.decode(token, chave, algorithms=[ALGORITHM])
     except JWTError:
-        raise credentials_exception
+        raise token_invalido() from None
+    if payload.get("sub") is None or not isinstance(payload.get("exp"), (int, float)):
+        raise token_invalido()
+    return payload
+
+def verificar_token(token: str) -> dict:
+    """Payload do token; os já verificados e dentro do exp vêm do cache"""
+    item = cache_tokens.get(token)
+    if item is not None:
+        payload, exp = item
+        if exp > time.time():
+            return payload
+        cache_tokens.pop(token)
+        raise token_invalido()
+    payload = decodificar_token(token)
+    cache_tokens.set(token, (payload, payload["exp"]))
+    return payload
+
+# --- Revogação de sessões ---
+# Sessões revogadas (logout, troca de senha, reuso de refresh token) ficam num conjunto
+# em memória recarregado do banco a cada REVOGACAO_INTERVALO segundos: a rota
+# autenticada nunca vai ao banco para saber se o token foi revogado. Só importam as
+# revogações mais novas que a validade do access token; as anteriores já expiraram.
+REVOGACAO_INTERVALO = float(os.getenv("REVOGACAO_INTERVALO", "5"))
+
+SQL_SESSOES_REVOGADAS = """
+    SELECT id FROM sessoes
+    WHERE revogada_em > NOW() - make_interval(secs => $1)
+"""
+
+class ListaRevogacao:
+    """Ids de sessões revogadas (claim `sid` do access token), sincronizados com o banco"""
+
+    def __init__(self):
+        self._revogadas: set[int] = set()
+        # Revogadas por este processo: valem na hora, antes de a recarga trazê-las
+        self._locais: dict[int, float] = {}
+        self._tarefa: asyncio.Task | None = None
+        self.recargas = 0
+        self.falhas = 0
+        self.bloqueados = 0
+        self.ultima_recarga: float | None = None
+
+    def revogada(self, sid) -> bool:
+        if sid is not None and sid in self._revogadas:
+            self.bloqueados += 1
+            return True
+        return False
+
+    def revogar(self, *sids: int) -> None:
+        agora = time.monotonic()
+        for sid in sids:
+            self._locais[sid] = agora
+            self._revogadas.add(sid)
+
+    async def recarregar(self, pool) -> None:
+        async with pool.acquire() as conn:
+            linhas = await conn.fetch(SQL_SESSOES_REVOGADAS, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        # Uma revogação local pode ter sido gravada depois da leitura acima
+        limite = time.monotonic() - 2 * REVOGACAO_INTERVALO
+        self._locais = {sid: t for sid, t in self._locais.items() if t > limite}
+        self._revogadas = {r["id"] for r in linhas} | self._locais.keys()
+        self.recargas += 1
+        self.ultima_recarga = time.monotonic()
+
+    async def iniciar(self, pool) -> None:
+        await self.recarregar(pool)
+        self._tarefa = asyncio.create_task(self._executar(pool))
+
+    async def _executar(self, pool) -> None:
+        while True:
+            await asyncio.sleep(REVOGACAO_INTERVALO)
+            try:
+                await self.recarregar(pool)
+            except Exception as e:
+                # Mantém a última lista; a próxima recarga tenta de novo
+                self.falhas += 1
+                logging.warning("Falha ao recarregar a lista de revogação: %r", e)
+
+    def encerrar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    def estatisticas(self) -> dict:
+        return {
+            "revogadas": len(self._revogadas),
+            "intervalo_s": REVOGACAO_INTERVALO,
+            "recargas": self.recargas,
+            "falhas": self.falhas,
+            "bloqueados": self.bloqueados,
+            "idade_s": round(time.monotonic() - self.ultima_recarga, 3) if self.ultima_recarga else None,
+        }
+
+revogacoes = ListaRevogacao()
+
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """Valida o token JWT e retorna o payload (sub = e-mail, uid = id do usuário, sid = sessão)"""
+    # async: com o cache a verificação é barata e não precisa do threadpool do FastAPI
+    payload = verificar_token(token)
+    if revogacoes.revogada(payload.get("sid")):
+        raise token_invalido()
+    return payload
+
+def get_current_user(payload: dict = Depends(get_token_payload)) -> str:
+    """Retorna o e-mail do usuário autenticado"""
+    return payload["sub"]
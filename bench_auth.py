@@ -0,0 +1,84 @@
+"""
+Benchmark da verificação de JWT por requisição: decode completo pelo python-jose
+(caminho antigo) x cache de tokens verificados (auth.verificar_token).
+
+Simula RPS requisições por segundo vindas de --usuarios sessões ativas e mede o
+custo de CPU por requisição e a fração de um núcleo gasta só com autenticação.
+
+Uso:
+    python bench_auth.py --rps 5000 --segundos 5 --usuarios 2000
+"""
+import argparse
+import random
+import time
+
+from fastapi import HTTPException
+from jose import JWTError, jwt
+
+import auth
+
+
+def caminho_antigo(token: str) -> dict:
+    """Reprodução do get_token_payload anterior: exceção nova e decode a cada chamada"""
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Token inválido ou expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        if payload.get("sub") is None:
+            raise credentials_exception
+        return payload
+    except JWTError:
+        raise credentials_exception
+
+
+def medir(nome: str, verificar, tokens: list[str], rps: int) -> float:
+    inicio = time.perf_counter()
+    for token in tokens:
+        verificar(token)
+    total = time.perf_counter() - inicio
+    por_req_us = total / len(tokens) * 1e6
+    print(f"{nome:<22} {por_req_us:9.2f} us/req   {por_req_us * rps / 1e4:6.2f}% de um núcleo a {rps} RPS")
+    return por_req_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=int, default=5000)
+    parser.add_argument("--segundos", type=int, default=5, help="duração simulada da carga")
+    parser.add_argument("--usuarios", type=int, default=2000, help="sessões (tokens) distintas")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessoes = [
+        auth.create_access_token({"sub": f"usuario{i}@hunter.com", "uid": i}) for i in range(1, args.usuarios + 1)
+    ]
+    # Tokens antigos (sem kid) para o caminho antigo, que só conhece SECRET_KEY
+    sessoes_antigas = [
+        jwt.encode(jwt.get_unverified_claims(t), auth.SECRET_KEY, algorithm=auth.ALGORITHM) for t in sessoes
+    ]
+    indices = [rng.randrange(args.usuarios) for _ in range(args.rps * args.segundos)]
+
+    print(f"{len(indices)} requisições, {args.usuarios} sessões, cache de {auth.JWT_CACHE_MAX_ITENS} tokens")
+    antigo = medir("decode a cada req.", caminho_antigo, [sessoes_antigas[i] for i in indices], args.rps)
+    auth.cache_tokens.invalidar()
+    novo = medir("cache de tokens", auth.verificar_token, [sessoes[i] for i in indices], args.rps)
+    print(f"ganho: {antigo / novo:.1f}x   {auth.cache_tokens.estatisticas()}")
+
+    # Token inválido: exceção pré-montada x construída a cada falha
+    invalido = sessoes[0][:-4] + "AAAA"
+    for nome, verificar in (("inválido (antigo)", caminho_antigo), ("inválido (novo)", auth.verificar_token)):
+        inicio = time.perf_counter()
+        for _ in range(10000):
+            try:
+                verificar(invalido)
+            except HTTPException:
+                pass
+        print(f"{nome:<22} {(time.perf_counter() - inicio) / 10000 * 1e6:9.2f} us/req")
+
+
+if __name__ == "__main__":
+    main()
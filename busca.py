@@ -0,0 +1,301 @@
+# busca.py
+"""Montagem das consultas da busca pública de produtos (Kabum + Mercado Livre)."""
+import base64
+import json
+import re
+import unicodedata
+from decimal import Decimal
+
+# --- Planos de execução ---
+# "fts": websearch_to_tsquery + similaridade de trigramas (índices GIN)
+# "substring": LIKE '%termo%' sobre o nome normalizado (fallback p/ termos curtos)
+PLANO_FTS = "fts"
+PLANO_SUBSTRING = "substring"
+
+# Termos menores que isso não geram trigramas/lexemas úteis
+MIN_CARACTERES_FTS = 3
+
+# --- Paginação ---
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+# Canal do NOTIFY enviado pelos scrapers após gravar produtos (invalida o cache)
+CANAL_PRODUTOS_ATUALIZADOS = "produtos_atualizados"
+
+# --- Streaming (NDJSON) ---
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+# Linhas buscadas por ida ao cursor do servidor
+STREAM_PREFETCH = 200
+
+# Nome exibido de cada origem (produtos_busca.origem)
+ROTULOS_ORIGEM = {"kabum": "Kabum", "mercadolivre": "Mercado Livre"}
+
+# Colunas geradas de produtos_busca (hunter_normalizar(nome) e o tsvector dele)
+NOME_NORMALIZADO = "nome_normalizado"
+VETOR_NOME = "vetor"
+
+
+def normalizar_termo(texto: str) -> str:
+    """Remove acentos, converte para minúsculas e colapsa espaços.
+
+    Usa a mesma decomposição NFKD do normalize_text do scraper da Kabum, para que
+    o termo buscado e os nomes gravados fiquem na mesma forma.
+    """
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", sem_acento).strip().lower()
+
+
+def escolher_plano(termo: str, modo: str = "auto") -> str:
+    """Define qual plano usar para o termo já normalizado."""
+    if modo == PLANO_SUBSTRING:
+        return PLANO_SUBSTRING
+    if modo == PLANO_FTS:
+        return PLANO_FTS
+    return PLANO_FTS if len(termo) >= MIN_CARACTERES_FTS else PLANO_SUBSTRING
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filtro_e_rank(plano: str, alias: str = "") -> tuple[str, str]:
+    """Retorna (condição WHERE, expressão de relevância) usando o parâmetro $1.
+
+    Com `alias`, as colunas saem qualificadas (b.nome_normalizado), para consultas
+    que leem produtos_busca mais de uma vez.
+    """
+    prefixo = f"{alias}." if alias else ""
+    nome, vetor = f"{prefixo}{NOME_NORMALIZADO}", f"{prefixo}{VETOR_NOME}"
+    if plano == PLANO_SUBSTRING:
+        return f"{nome} LIKE '%' || $1 || '%'", "0"
+
+    consulta = "websearch_to_tsquery('portuguese', $1)"
+    filtro = f"({vetor} @@ {consulta} OR $1 <% {nome})"
+    rank = f"ts_rank({vetor}, {consulta}) + word_similarity($1, {nome})"
+    return filtro, rank
+
+
+def codificar_cursor(r) -> str:
+    """Gera o cursor opaco (preco, id, origem) a partir da última linha da página."""
+    bruto = json.dumps([str(r["preco"]), r["id"], r["origem"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[Decimal, int, str]:
+    """Lê um cursor gerado por codificar_cursor. Lança ValueError se for inválido."""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        preco, produto_id, origem = json.loads(base64.urlsafe_b64decode(preenchido))
+        return Decimal(preco), int(produto_id), str(origem)
+    except Exception as e:
+        raise ValueError("Cursor inválido.") from e
+
+
+def montar_consulta(
+    termo: str,
+    plano: str,
+    ordem: str = "preco",
+    limite: int | None = LIMITE_PADRAO,
+    cursor: tuple[Decimal, int, str] | None = None,
+    incluir_imagens: bool = True,
+) -> tuple[str, list]:
+    """Monta a consulta sobre produtos_busca para o plano escolhido.
+
+    Na ordem por preço a paginação é por keyset em (preco, id, origem): a consulta
+    percorre o índice idx_busca_preco a partir do cursor e para em limite + 1 linhas,
+    então o banco nunca materializa todos os resultados do termo.
+    Com limite=None (modo streaming) não há LIMIT e as linhas saem na ordem do índice.
+    Sem incluir_imagens a galeria nem sai do banco.
+    """
+    filtro, rank = _filtro_e_rank(plano)
+    args: list = [_escapar_like(termo) if plano == PLANO_SUBSTRING else termo]
+
+    ordem_sql = "preco, produto_id, origem"
+    if ordem == "relevancia":
+        ordem_sql = f"{rank} DESC, {ordem_sql}"
+
+    if cursor is not None:
+        args.extend(cursor)
+        filtro += " AND (preco, produto_id, origem) > ($2::numeric, $3::integer, $4::varchar)"
+
+    if limite is None:
+        clausula_limite = ""
+    else:
+        args.append(limite + 1)
+        clausula_limite = f"LIMIT ${len(args)}"
+
+    imagens = ", imagens_urls" if incluir_imagens else ""
+    query = f"""
+        /* busca_{plano} */
+        SELECT produto_id AS id, nome, preco, link, imagem_url{imagens}, origem
+        FROM produtos_busca
+        WHERE {filtro}
+        ORDER BY {ordem_sql}
+        {clausula_limite}
+    """
+    return query, args
+
+
+def _oferta_json(alias: str, id_sql: str | None = None) -> str:
+    """Objeto JSON de uma oferta da busca agrupada (ver formatar_grupo)."""
+    id_sql = id_sql or f"{alias}.produto_id"
+    return (
+        f"json_build_object('id', {id_sql}::text, 'nome', {alias}.nome, 'preco', {alias}.preco, "
+        f"'link', {alias}.link, 'imagem_url', {alias}.imagem_url, 'origem', {alias}.origem)"
+    )
+
+
+def montar_consulta_agrupada(
+    termo: str,
+    plano: str,
+    ordem: str = "preco",
+    limite: int = LIMITE_PADRAO,
+    cursor: tuple[Decimal, int, str] | None = None,
+) -> tuple[str, list]:
+    """Monta a busca com um resultado por grupo de produtos equivalentes.
+
+    Os grupos vêm de grupos_produtos_membros (scraping/correspondencia.py); produtos
+    sem grupo aparecem sozinhos. Cada grupo é representado pela sua oferta encontrada
+    mais barata: a consulta percorre idx_busca_preco a partir do cursor, descarta
+    ofertas que têm uma mais barata no mesmo grupo e para em limite + 1
+    representantes, como montar_consulta. Só então busca as ofertas de cada grupo
+    (todas as lojas, da mais barata para a mais cara). O cursor é o mesmo da busca
+    simples, (preco, id, origem) do representante. Na ordem por relevância vale a
+    maior relevância entre as ofertas do grupo.
+    """
+    filtro, rank = _filtro_e_rank(plano, "b")
+    filtro_oferta, rank_oferta = _filtro_e_rank(plano, "o")
+    args: list = [_escapar_like(termo) if plano == PLANO_SUBSTRING else termo]
+
+    # Ofertas encontradas do grupo do representante (tabela de membros com alias mo)
+    ofertas_grupo = f"""
+        FROM grupos_produtos_membros mo
+        JOIN produtos_busca o ON o.origem = mo.origem AND o.produto_id = mo.produto_id
+        WHERE mo.grupo_id = {{grupo}} AND {filtro_oferta}
+    """
+
+    relevancia = ""
+    ordem_sql = "b.preco, b.produto_id, b.origem"
+    ordem_final = "r.preco, r.id, r.origem"
+    if ordem == "relevancia":
+        relevancia = (
+            f", GREATEST({rank}, (SELECT MAX({rank_oferta}) {ofertas_grupo.format(grupo='m.grupo_id')})) AS relevancia"
+        )
+        ordem_sql = f"relevancia DESC, {ordem_sql}"
+        ordem_final = f"r.relevancia DESC, {ordem_final}"
+
+    if cursor is not None:
+        args.extend(cursor)
+        filtro += " AND (b.preco, b.produto_id, b.origem) > ($2::numeric, $3::integer, $4::varchar)"
+    args.append(limite + 1)
+
+    query = f"""
+        /* busca_agrupada_{plano} */
+        WITH representantes AS (
+            SELECT b.origem, b.produto_id AS id, b.nome, b.preco, b.link, b.imagem_url, m.grupo_id{relevancia}
+            FROM produtos_busca b
+            LEFT JOIN grupos_produtos_membros m ON m.origem = b.origem AND m.produto_id = b.produto_id
+            WHERE {filtro}
+              AND NOT EXISTS (
+                  SELECT 1 {ofertas_grupo.format(grupo='m.grupo_id')}
+                    AND (o.preco, o.produto_id, o.origem) < (b.preco, b.produto_id, b.origem)
+              )
+            ORDER BY {ordem_sql}
+            LIMIT ${len(args)}
+        )
+        SELECT r.id, r.origem, r.preco, r.preco AS menor_preco, r.grupo_id,
+               COALESCE(g.nome, r.nome) AS nome,
+               COALESCE(
+                   (SELECT json_agg({_oferta_json("o")} ORDER BY o.preco, o.produto_id)
+                    {ofertas_grupo.format(grupo='r.grupo_id')}),
+                   json_build_array({_oferta_json("r", "r.id")})
+               ) AS ofertas
+        FROM representantes r
+        LEFT JOIN grupos_produtos g ON g.id = r.grupo_id
+        ORDER BY {ordem_final}
+    """
+    return query, args
+
+
+def paginar(rows: list, limite: int, ordem: str = "preco") -> tuple[list, str | None]:
+    """Separa a página pedida e calcula o next_cursor (só na ordem por preço)."""
+    pagina = rows[:limite]
+    if len(rows) <= limite or ordem != "preco":
+        return pagina, None
+    return pagina, codificar_cursor(pagina[-1])
+
+
+def formatar_produto(r, incluir_imagens: bool = True) -> dict:
+    """Converte uma linha do banco no dicionário devolvido pela API."""
+    produto = {
+        "id": str(r["id"]),
+        "nome": r["nome"],
+        "preco": float(r["preco"]),
+        "link": r["link"],
+        "imagem_url": r["imagem_url"],
+        "origem": ROTULOS_ORIGEM[r["origem"]],
+    }
+    if incluir_imagens:
+        # text[] chega do asyncpg já como lista
+        produto["imagens_urls"] = r["imagens_urls"] or []
+    return produto
+
+
+def formatar_grupo(r) -> dict:
+    """Converte uma linha da busca agrupada: ofertas e menor preço de cada loja."""
+    ofertas = r["ofertas"]  # json decodificado pelo codec da conexão (app.py)
+    precos_por_loja = {}
+    for oferta in ofertas:
+        oferta["preco"] = float(oferta["preco"])
+        oferta["origem"] = ROTULOS_ORIGEM[oferta["origem"]]
+        # As ofertas já vêm ordenadas por preço: a primeira de cada loja é a menor
+        precos_por_loja.setdefault(oferta["origem"], oferta["preco"])
+
+    return {
+        "grupo_id": r["grupo_id"],
+        "nome": r["nome"],
+        "menor_preco": float(r["menor_preco"]),
+        "precos_por_loja": precos_por_loja,
+        "ofertas": ofertas,
+    }
+
+
+def consultas_busca_quentes() -> list[tuple[str, list]]:
+    """Variações mais comuns da busca, para o pool preparar em cada conexão nova.
+
+    O texto da consulta é o mesmo que montar_consulta gera nas requisições (a
+    chave do cache de statements do asyncpg); o LIMIT vai como 0, então o
+    Postgres prepara o plano sem ler nenhuma linha.
+    """
+    variacoes = [
+        montar_consulta("aquecimento", PLANO_FTS),
+        montar_consulta("aquecimento", PLANO_FTS, cursor=(Decimal(0), 0, "")),
+        montar_consulta("aquecimento", PLANO_FTS, ordem="relevancia"),
+        montar_consulta("aq", PLANO_SUBSTRING),
+        montar_consulta_agrupada("aquecimento", PLANO_FTS),
+    ]
+    return [(query, [*args[:-1], 0]) for query, args in variacoes]
+
+
+async def transmitir_produtos(
+    pool, query: str, args: list, limite: int | None = None, incluir_imagens: bool = True, ordem: str = "preco"
+):
+    """Gera linhas NDJSON lendo de um cursor do servidor (asyncpg).
+
+    A conexão é obtida do pool aqui dentro porque a resposta continua sendo
+    enviada depois que as dependências do endpoint já foram finalizadas.
+    Com `limite`, se a linha limite + 1 existir (e a ordem for por preço) a última
+    linha do stream é `{"next_cursor": ...}`, calculado a partir do último produto.
+    """
+    enviados = 0
+    ultima = None
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for r in conn.cursor(query, *args, prefetch=STREAM_PREFETCH):
+                if limite is not None and enviados >= limite:
+                    if ordem == "preco":
+                        yield json.dumps({"next_cursor": codificar_cursor(ultima)}) + "\n"
+                    break
+                yield json.dumps(formatar_produto(r, incluir_imagens), ensure_ascii=False) + "\n"
+                ultima = r
+                enviados += 1
@@ -0,0 +1,112 @@
+# cache.py
+"""Cache em memória (LRU + TTL) com coalescência de cargas concorrentes."""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_AUSENTE = object()
+
+
+def _consumir_excecao(tarefa: asyncio.Task) -> None:
+    # Evita o aviso de exceção não lida quando todos os interessados foram cancelados
+    if not tarefa.cancelled():
+        tarefa.exception()
+
+
+class CacheTTL:
+    """Cache LRU limitado por quantidade de itens, com expiração por TTL.
+
+    `obter_ou_carregar` garante que várias requisições concorrentes pela mesma
+    chave ausente compartilhem uma única carga (uma só consulta ao banco).
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl: float = 60.0):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._pendentes: dict[Hashable, asyncio.Task] = {}
+        # Incrementada a cada invalidação: cargas iniciadas antes não são gravadas
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalescidos = 0
+        self.expulsoes = 0
+        self.invalidacoes = 0
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        """Retorna o valor em cache (ou `padrao`), atualizando a posição LRU."""
+        item = self._dados.get(chave)
+        if item is None:
+            self.misses += 1
+            return padrao
+        expira_em, valor = item
+        if expira_em <= time.monotonic():
+            del self._dados[chave]
+            self.misses += 1
+            return padrao
+        self._dados.move_to_end(chave)
+        self.hits += 1
+        return valor
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        self._dados[chave] = (time.monotonic() + self.ttl, valor)
+        self._dados.move_to_end(chave)
+        while len(self._dados) > self.max_itens:
+            self._dados.popitem(last=False)
+            self.expulsoes += 1
+
+    def pop(self, chave: Hashable) -> None:
+        self._dados.pop(chave, None)
+
+    def invalidar(self) -> None:
+        """Descarta todo o conteúdo (ex.: após um scraper gravar produtos)."""
+        self._dados.clear()
+        # Cargas em andamento leram antes da gravação: quem chegar depois carrega de novo
+        self._pendentes.clear()
+        self._geracao += 1
+        self.invalidacoes += 1
+
+    async def obter_ou_carregar(self, chave: Hashable, carregar: Callable[[], Awaitable[Any]]) -> Any:
+        valor = self.get(chave, _AUSENTE)
+        if valor is not _AUSENTE:
+            return valor
+
+        tarefa = self._pendentes.get(chave)
+        if tarefa is not None:
+            self.coalescidos += 1
+        else:
+            # A carga roda numa tarefa própria: se quem a iniciou for cancelado (cliente
+            # desconectou), ela continua para os demais que estão esperando a mesma chave
+            tarefa = asyncio.ensure_future(self._carregar(chave, carregar, self._geracao))
+            tarefa.add_done_callback(_consumir_excecao)
+            self._pendentes[chave] = tarefa
+        return await asyncio.shield(tarefa)
+
+    async def _carregar(self, chave: Hashable, carregar: Callable[[], Awaitable[Any]], geracao: int) -> Any:
+        try:
+            valor = await carregar()
+            if geracao == self._geracao:
+                self.set(chave, valor)
+            return valor
+        finally:
+            # Depois de uma invalidação a chave pode já ser de uma carga mais nova
+            if self._pendentes.get(chave) is asyncio.current_task():
+                del self._pendentes[chave]
+
+    def estatisticas(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "itens": len(self._dados),
+            "max_itens": self.max_itens,
+            "ttl_segundos": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalescidos": self.coalescidos,
+            "expulsoes": self.expulsoes,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": round(self.hits / consultas, 4) if consultas else 0.0,
+        }
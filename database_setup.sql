@@ -50,9 +50,451 @@ ALTER TABLE produtos_kabum
 ALTER TABLE produtos_mercadolivre
     ADD COLUMN IF NOT EXISTS imagem_url TEXT;
 
+-- Todas as imagens da galeria (scraper da Kabum)
+ALTER TABLE produtos_kabum
+    ADD COLUMN IF NOT EXISTS imagens_urls TEXT[];
+
+-- Galeria em JSON (texto) para array; JSON inválido vira NULL em vez de abortar a migração
+CREATE OR REPLACE FUNCTION hunter_imagens(texto TEXT)
+RETURNS TEXT[]
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+AS $$
+BEGIN
+    IF texto IS NULL OR texto = '' THEN
+        RETURN NULL;
+    END IF;
+    RETURN ARRAY(SELECT jsonb_array_elements_text(texto::jsonb));
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END $$;
+
+-- Migração: imagens_urls era TEXT com um array JSON
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'produtos_kabum' AND column_name = 'imagens_urls' AND data_type = 'text'
+    ) THEN
+        ALTER TABLE produtos_kabum ALTER COLUMN imagens_urls TYPE TEXT[] USING hunter_imagens(imagens_urls);
+    END IF;
+END $$;
+
 CREATE INDEX IF NOT EXISTS idx_feedbacks_usuario ON feedbacks(usuario_id);
 CREATE INDEX IF NOT EXISTS idx_alertas_usuario ON alertas_preco(usuario_id);
-CREATE INDEX IF NOT EXISTS idx_kabum_nome ON produtos_kabum USING gin (to_tsvector('portuguese', nome));
-CREATE INDEX IF NOT EXISTS idx_mercadolivre_nome ON produtos_mercadolivre USING gin (to_tsvector('portuguese', nome));
+
+-- Busca de produtos: full-text + trigramas sobre o nome sem acentos
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Wrapper IMMUTABLE para poder indexar; faz exatamente o normalizar_termo de busca.py
+-- (NFKD, descarta o que não é ASCII, minúsculas, espaços colapsados), para o termo
+-- buscado e os nomes gravados ficarem na mesma forma também no modo substring
+CREATE OR REPLACE FUNCTION hunter_normalizar(texto TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+    SELECT lower(btrim(regexp_replace(
+        regexp_replace(normalize(texto, NFKD), '[^\x01-\x7F]', '', 'g'),
+        '\s+', ' ', 'g'
+    )))
+$$;
+
+DROP INDEX IF EXISTS idx_kabum_nome;
+DROP INDEX IF EXISTS idx_mercadolivre_nome;
+
+-- Histórico de preços: as tabelas de loja guardam uma linha por produto (identidade
+-- pelo link) com o preço atual; cada preço observado vira uma linha append-only aqui.
+CREATE TABLE IF NOT EXISTS historico_precos (
+    id BIGSERIAL PRIMARY KEY,
+    origem VARCHAR(20) NOT NULL CHECK (origem IN ('kabum', 'mercadolivre')),
+    produto_id INTEGER NOT NULL,
+    preco NUMERIC(12,2) NOT NULL CHECK (preco >= 0),
+    observado_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_historico_produto ON historico_precos (origem, produto_id, observado_em);
+-- Inserções chegam em ordem de tempo: BRIN fica minúsculo e serve varreduras por período
+CREATE INDEX IF NOT EXISTS idx_historico_observado_brin ON historico_precos USING brin (observado_em);
+
+-- Migração: dobra as linhas duplicadas (mesmo link) em uma só e leva os preços para o histórico.
+-- As linhas antigas não têm data; a ordem dos ids é preservada com intervalos de 1 segundo.
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('kabum', 'produtos_kabum'), ('mercadolivre', 'produtos_mercadolivre')) AS v(origem, tabela) LOOP
+        IF NOT EXISTS (SELECT 1 FROM historico_precos WHERE origem = t.origem) THEN
+            EXECUTE format($f$
+                INSERT INTO historico_precos (origem, produto_id, preco, observado_em)
+                SELECT %L,
+                       MIN(id) OVER (PARTITION BY link),
+                       preco,
+                       NOW() - (COUNT(*) OVER (PARTITION BY link)
+                                - ROW_NUMBER() OVER (PARTITION BY link ORDER BY id)) * INTERVAL '1 second'
+                FROM %I
+            $f$, t.origem, t.tabela);
+        END IF;
+
+        -- A linha sobrevivente (menor id) recebe o preço e a imagem mais recentes do grupo
+        EXECUTE format($f$
+            UPDATE %1$I AS p
+            SET preco = ultimo.preco,
+                imagem_url = COALESCE(ultimo.imagem_url, p.imagem_url)
+            FROM (SELECT link, MIN(id) AS id FROM %1$I GROUP BY link HAVING COUNT(*) > 1) AS grupos,
+                 (SELECT DISTINCT ON (link) link, preco, imagem_url FROM %1$I ORDER BY link, id DESC) AS ultimo
+            WHERE p.id = grupos.id AND ultimo.link = grupos.link
+        $f$, t.tabela);
+
+        EXECUTE format($f$
+            DELETE FROM %1$I AS p USING %1$I AS q WHERE p.link = q.link AND p.id > q.id
+        $f$, t.tabela);
+    END LOOP;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_kabum_link ON produtos_kabum (link);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mercadolivre_link ON produtos_mercadolivre (link);
+
+-- Link canônico (sem query string/fragmento): chave de identidade usada pelo upsert em
+-- lote dos scrapers. Equivale a canonicalizar_link de scraping/persistencia.py.
+CREATE OR REPLACE FUNCTION hunter_link_canonico(link TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+    SELECT CASE
+        WHEN link ~ '^https?://click' THEN split_part(btrim(link), '#', 1)
+        ELSE split_part(split_part(btrim(link), '#', 1), '?', 1)
+    END
+$$;
+
+-- Migração: links que só diferem no rastreamento viram um produto; o histórico
+-- das linhas removidas passa para a sobrevivente (menor id).
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('kabum', 'produtos_kabum'), ('mercadolivre', 'produtos_mercadolivre')) AS v(origem, tabela) LOOP
+        EXECUTE format($f$
+            CREATE TEMP TABLE grupos_link AS
+            SELECT id, MIN(id) OVER (PARTITION BY hunter_link_canonico(link)) AS sobrevivente
+            FROM %I
+        $f$, t.tabela);
+
+        UPDATE historico_precos h
+        SET produto_id = g.sobrevivente
+        FROM grupos_link g
+        WHERE h.origem = t.origem AND h.produto_id = g.id AND g.id <> g.sobrevivente;
+
+        EXECUTE format($f$
+            DELETE FROM %I p USING grupos_link g WHERE p.id = g.id AND g.id <> g.sobrevivente
+        $f$, t.tabela);
+
+        EXECUTE format($f$
+            UPDATE %1$I SET link = hunter_link_canonico(link) WHERE link <> hunter_link_canonico(link)
+        $f$, t.tabela);
+
+        DROP TABLE grupos_link;
+    END LOOP;
+END $$;
+
+-- Notificações geradas pelo motor de alertas (scraping/motor_alertas.py)
+CREATE TABLE IF NOT EXISTS notificacoes_alerta (
+    id BIGSERIAL PRIMARY KEY,
+    alerta_id INTEGER NOT NULL REFERENCES alertas_preco(id) ON DELETE CASCADE,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    origem VARCHAR(20) NOT NULL CHECK (origem IN ('kabum', 'mercadolivre')),
+    produto_id INTEGER NOT NULL,
+    preco NUMERIC(12,2) NOT NULL,
+    lida BOOLEAN NOT NULL DEFAULT FALSE,
+    criado_em TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    UNIQUE (alerta_id, origem, produto_id, preco)
+);
+
+CREATE INDEX IF NOT EXISTS idx_notificacoes_usuario ON notificacoes_alerta (usuario_id, id DESC);
+
+-- Cache de páginas dos scrapers (re-scraping incremental, scraping/cache_paginas.py)
+CREATE TABLE IF NOT EXISTS cache_paginas (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    hash_conteudo CHAR(64) NOT NULL,
+    verificado_em TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+    alterado_em TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW()
+);
+
+-- Jobs do agendador de scraping (scraping/agendador.py). `alvo` é a URL da categoria
+-- na Kabum ou o termo de busca no Mercado Livre; intervalos em segundos.
+CREATE TABLE IF NOT EXISTS jobs_scraping (
+    id SERIAL PRIMARY KEY,
+    site VARCHAR(20) NOT NULL CHECK (site IN ('kabum', 'mercadolivre')),
+    alvo TEXT NOT NULL,
+    nome VARCHAR(100),
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    max_produtos INTEGER NOT NULL DEFAULT 400,
+    intervalo INTEGER NOT NULL DEFAULT 21600,
+    intervalo_min INTEGER NOT NULL DEFAULT 1800,
+    intervalo_max INTEGER NOT NULL DEFAULT 86400,
+    ativo BOOLEAN NOT NULL DEFAULT TRUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente' CHECK (status IN ('pendente', 'executando', 'erro')),
+    proxima_execucao TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    iniciado_em TIMESTAMP WITHOUT TIME ZONE,
+    heartbeat_em TIMESTAMP WITHOUT TIME ZONE,
+    concluido_em TIMESTAMP WITHOUT TIME ZONE,
+    falhas_seguidas INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT,
+    ultima_taxa_alteracao REAL,
+    UNIQUE (site, alvo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_scraping_fila ON jobs_scraping (proxima_execucao) WHERE ativo;
+
+-- Os alvos que antes eram fixos nos scripts
+INSERT INTO jobs_scraping (site, alvo, nome, prioridade) VALUES
+    ('kabum', 'https://www.kabum.com.br/hardware/monitores', 'monitor', 10),
+    ('mercadolivre', 'teclado', 'teclado', 10)
+ON CONFLICT (site, alvo) DO NOTHING;
+
+-- Última página gravada de cada categoria/termo (scraping/checkpoints.py); uma coleta
+-- interrompida recomeça dali. A linha é apagada quando a coleta termina.
+CREATE TABLE IF NOT EXISTS checkpoints_scraping (
+    site VARCHAR(20) NOT NULL,
+    alvo TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    atualizado_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (site, alvo)
+);
+
+-- Grupos de produtos equivalentes entre as lojas (scraping/correspondencia.py)
+CREATE TABLE IF NOT EXISTS grupos_produtos (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    modelo VARCHAR(100),
+    criado_em TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS grupos_produtos_membros (
+    origem VARCHAR(20) NOT NULL CHECK (origem IN ('kabum', 'mercadolivre')),
+    produto_id INTEGER NOT NULL,
+    grupo_id INTEGER NOT NULL REFERENCES grupos_produtos(id) ON DELETE CASCADE,
+    PRIMARY KEY (origem, produto_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_grupos_membros_grupo ON grupos_produtos_membros (grupo_id);
+
+-- Chaves LSH (bandas MinHash e números de modelo) dos produtos que já passaram pela
+-- correspondência. Produto sem linha aqui é novo; a rodada seguinte calcula só a
+-- assinatura dele e lê do banco só os baldes que ele acerta.
+CREATE TABLE IF NOT EXISTS baldes_produtos (
+    origem VARCHAR(20) NOT NULL CHECK (origem IN ('kabum', 'mercadolivre')),
+    produto_id INTEGER NOT NULL,
+    chave TEXT NOT NULL,
+    PRIMARY KEY (origem, produto_id, chave)
+);
+
+CREATE INDEX IF NOT EXISTS idx_baldes_produtos_chave ON baldes_produtos (chave);
+
+-- Tabela única da busca pública: uma linha por produto das duas lojas, com o nome já
+-- normalizado, o vetor de busca e a galeria decodificada. Mantida pelos triggers abaixo
+-- na mesma transação em que os scrapers gravam, então nunca fica para trás.
+CREATE TABLE IF NOT EXISTS produtos_busca (
+    origem VARCHAR(20) NOT NULL CHECK (origem IN ('kabum', 'mercadolivre')),
+    produto_id INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    preco NUMERIC(12,2) NOT NULL,
+    link TEXT NOT NULL,
+    imagem_url TEXT,
+    imagens_urls TEXT[],
+    nome_normalizado TEXT GENERATED ALWAYS AS (hunter_normalizar(nome)) STORED,
+    vetor tsvector GENERATED ALWAYS AS (to_tsvector('portuguese', hunter_normalizar(nome))) STORED,
+    atualizado_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (origem, produto_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_busca_vetor ON produtos_busca USING gin (vetor);
+CREATE INDEX IF NOT EXISTS idx_busca_nome_trgm ON produtos_busca USING gin (nome_normalizado gin_trgm_ops);
+-- Paginação por keyset em (preco, produto_id, origem)
+CREATE INDEX IF NOT EXISTS idx_busca_preco ON produtos_busca (preco, produto_id, origem);
+
+-- A busca lê só produtos_busca: os índices de nome e de keyset nas tabelas de loja só
+-- encareciam cada upsert dos scrapers
+DROP INDEX IF EXISTS idx_kabum_nome_fts;
+DROP INDEX IF EXISTS idx_mercadolivre_nome_fts;
+DROP INDEX IF EXISTS idx_kabum_nome_trgm;
+DROP INDEX IF EXISTS idx_mercadolivre_nome_trgm;
+DROP INDEX IF EXISTS idx_kabum_preco_id;
+DROP INDEX IF EXISTS idx_mercadolivre_preco_id;
+
+-- Galeria de uma linha de produto qualquer: NULL na loja que não tem a coluna (Mercado Livre)
+CREATE OR REPLACE FUNCTION hunter_galeria(linha JSONB)
+RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+    SELECT CASE WHEN jsonb_typeof(linha -> 'imagens_urls') = 'array'
+                THEN ARRAY(SELECT jsonb_array_elements_text(linha -> 'imagens_urls'))
+           END
+$$;
+
+-- Triggers por comando (não por linha): um upsert em lote dos scrapers vira um único
+-- INSERT ... ON CONFLICT aqui. TG_ARGV[0] é a origem.
+CREATE OR REPLACE FUNCTION hunter_busca_gravar()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO produtos_busca AS b (origem, produto_id, nome, preco, link, imagem_url, imagens_urls)
+    SELECT TG_ARGV[0], n.id, n.nome, n.preco, n.link, n.imagem_url, hunter_galeria(to_jsonb(n))
+    FROM novos n
+    ON CONFLICT (origem, produto_id) DO UPDATE SET
+        nome = EXCLUDED.nome,
+        preco = EXCLUDED.preco,
+        link = EXCLUDED.link,
+        imagem_url = EXCLUDED.imagem_url,
+        imagens_urls = EXCLUDED.imagens_urls,
+        atualizado_em = NOW()
+    WHERE (b.nome, b.preco, b.link, b.imagem_url, b.imagens_urls)
+        IS DISTINCT FROM (EXCLUDED.nome, EXCLUDED.preco, EXCLUDED.link, EXCLUDED.imagem_url, EXCLUDED.imagens_urls);
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION hunter_busca_remover()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM produtos_busca b USING antigos a WHERE b.origem = TG_ARGV[0] AND b.produto_id = a.id;
+    RETURN NULL;
+END $$;
+
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('kabum', 'produtos_kabum'), ('mercadolivre', 'produtos_mercadolivre')) AS v(origem, tabela) LOOP
+        -- Tabelas de transição não podem ser usadas por um trigger com mais de um evento
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_busca_insert ON %I', t.tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_busca_update ON %I', t.tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_busca_delete ON %I', t.tabela);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_busca_insert AFTER INSERT ON %I REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_busca_gravar(%L)
+        $f$, t.tabela, t.origem);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_busca_update AFTER UPDATE ON %I REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_busca_gravar(%L)
+        $f$, t.tabela, t.origem);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_busca_delete AFTER DELETE ON %I REFERENCING OLD TABLE AS antigos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_busca_remover(%L)
+        $f$, t.tabela, t.origem);
+
+        -- Carga inicial / reconciliação (ex.: depois de uma migração de coluna, que não dispara triggers)
+        EXECUTE format($f$
+            INSERT INTO produtos_busca AS b (origem, produto_id, nome, preco, link, imagem_url, imagens_urls)
+            SELECT %L, p.id, p.nome, p.preco, p.link, p.imagem_url, hunter_galeria(to_jsonb(p))
+            FROM %I p
+            ON CONFLICT (origem, produto_id) DO UPDATE SET
+                nome = EXCLUDED.nome,
+                preco = EXCLUDED.preco,
+                link = EXCLUDED.link,
+                imagem_url = EXCLUDED.imagem_url,
+                imagens_urls = EXCLUDED.imagens_urls,
+                atualizado_em = NOW()
+            WHERE (b.nome, b.preco, b.link, b.imagem_url, b.imagens_urls)
+                IS DISTINCT FROM (EXCLUDED.nome, EXCLUDED.preco, EXCLUDED.link, EXCLUDED.imagem_url, EXCLUDED.imagens_urls)
+        $f$, t.origem, t.tabela);
+    END LOOP;
+END $$;
+
+-- Colunas geradas não são recalculadas quando hunter_normalizar muda: regrava só as
+-- linhas que ficaram diferentes da definição atual (e com elas os índices da busca)
+UPDATE produtos_busca SET nome = nome
+WHERE nome_normalizado IS DISTINCT FROM hunter_normalizar(nome);
+
+-- Sessões de login com refresh tokens rotativos (sessoes.py). Cada login abre uma
+-- sessão; cada /token/refresh troca o refresh token por um novo da mesma sessão e marca
+-- o anterior como usado. Reapresentar um token já usado revoga a sessão inteira.
+CREATE TABLE IF NOT EXISTS sessoes (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    criada_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    revogada_em TIMESTAMP WITHOUT TIME ZONE,
+    motivo VARCHAR(20)  -- logout, senha, reuso
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessoes_usuario ON sessoes (usuario_id);
+-- Recarga periódica da lista de revogação da API (auth.ListaRevogacao)
+CREATE INDEX IF NOT EXISTS idx_sessoes_revogada ON sessoes (revogada_em) WHERE revogada_em IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token_hash CHAR(64) PRIMARY KEY,  -- sha256 do token; o token em si só o cliente conhece
+    sessao_id BIGINT NOT NULL REFERENCES sessoes(id) ON DELETE CASCADE,
+    emitido_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    expira_em TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    usado_em TIMESTAMP WITHOUT TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_sessao ON refresh_tokens (sessao_id, expira_em);
+
+-- Log de alterações para a sincronização contínua com o Firestore
+-- (scripts/migrate_to_firestore.py --sync). Cada INSERT/UPDATE/DELETE nas tabelas
+-- espelhadas vira uma linha aqui; o sync consome (apaga) as linhas na mesma transação
+-- em que confirma a gravação no Firestore, então nada se perde se ele cair no meio.
+-- É opt-in: sem consumidor o log só cresceria, então os triggers só registram com
+--   ALTER DATABASE hunter_db SET hunter.sync_firestore = 'on';
+-- (vale para as conexões abertas depois do ALTER). Entradas esquecidas por um sync
+-- parado há muito tempo são podadas quando ele volta (--sync-retention).
+CREATE TABLE IF NOT EXISTS alteracoes_sync (
+    id BIGSERIAL PRIMARY KEY,
+    tabela VARCHAR(40) NOT NULL,
+    registro_id INTEGER NOT NULL,
+    usuario_id INTEGER,  -- caminho das subcoleções usuarios/{id}/feedbacks e alertas_preco
+    excluido BOOLEAN NOT NULL DEFAULT FALSE,
+    alterado_em TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION hunter_sync_registrar()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF coalesce(current_setting('hunter.sync_firestore', true), '') <> 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO alteracoes_sync (tabela, registro_id, usuario_id, excluido)
+        SELECT TG_TABLE_NAME, a.id, (to_jsonb(a) ->> 'usuario_id')::int, TRUE FROM antigos a;
+    ELSE
+        INSERT INTO alteracoes_sync (tabela, registro_id, usuario_id)
+        SELECT TG_TABLE_NAME, n.id, (to_jsonb(n) ->> 'usuario_id')::int FROM novos n;
+    END IF;
+    -- Comando que não afetou nenhuma linha não acorda o sync
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    -- Acorda o sync; NOTIFYs iguais na mesma transação viram um só
+    PERFORM pg_notify('sync_firestore', TG_TABLE_NAME);
+    RETURN NULL;
+END $$;
+
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['usuarios', 'feedbacks', 'alertas_preco', 'produtos_kabum', 'produtos_mercadolivre'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_sync_insert ON %I', tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_sync_update ON %I', tabela);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_sync_delete ON %I', tabela);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_sync_insert AFTER INSERT ON %I REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_sync_registrar()
+        $f$, tabela);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_sync_update AFTER UPDATE ON %I REFERENCING NEW TABLE AS novos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_sync_registrar()
+        $f$, tabela);
+        EXECUTE format($f$
+            CREATE TRIGGER trg_sync_delete AFTER DELETE ON %I REFERENCING OLD TABLE AS antigos
+            FOR EACH STATEMENT EXECUTE FUNCTION hunter_sync_registrar()
+        $f$, tabela);
+    END LOOP;
+END $$;
 
 COMMIT;
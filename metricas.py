@@ -0,0 +1,166 @@
+# metricas.py
+"""Métricas da API no formato do Prometheus (GET /metrics).
+
+- contagem e latência das requisições por rota (o template, ex. /alertas/{alerta_id},
+  não a URL, para a cardinalidade não crescer com os ids);
+- espera por conexão livre e conexões em uso nos pools asyncpg (banco.py);
+- tempo de banco por consulta nomeada, medido pelo logger de consultas do asyncpg.
+  O nome vem de um comentário no início do SQL (/* login */ SELECT ...), que também
+  aparece no pg_stat_activity; sem comentário, vira verbo_tabela (select_alertas_preco);
+- acertos e falhas dos caches em memória (cache.CacheTTL).
+
+Com vários workers do uvicorn cada processo tem as suas séries; o Prometheus deve
+coletar de cada um (ou rodar com um worker por container).
+"""
+import re
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUISICOES = Counter(
+    "hunter_http_requisicoes_total", "Requisições atendidas", ["metodo", "rota", "status"]
+)
+LATENCIA = Histogram(
+    "hunter_http_latencia_segundos", "Latência das requisições até o fim da resposta",
+    ["metodo", "rota"], buckets=BUCKETS_LATENCIA,
+)
+ESPERA_POOL = Histogram(
+    "hunter_db_pool_espera_segundos", "Espera por uma conexão livre no pool", ["pool"], buckets=BUCKETS_LATENCIA
+)
+TEMPO_CONSULTA = Histogram(
+    "hunter_db_consulta_segundos", "Tempo de banco por consulta", ["consulta"], buckets=BUCKETS_LATENCIA
+)
+ERROS_CONSULTA = Counter("hunter_db_consulta_erros_total", "Consultas que terminaram em erro", ["consulta"])
+
+# --- Nome das consultas ---
+_COMENTARIO = re.compile(r"\s*/\*\s*([\w.:-]+)\s*\*/")
+_VERBO = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_TABELA = {
+    "insert": re.compile(r"\bINTO\s+(\w+)", re.IGNORECASE),
+    "update": re.compile(r"\bUPDATE\s+(\w+)", re.IGNORECASE),
+}
+_TABELA_FROM = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+_TRANSACAO = re.compile(r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+# Consulta que o pool do asyncpg roda ao devolver cada conexão (Connection.reset)
+_RESET = re.compile(r"\s*SELECT pg_advisory_unlock_all\(\)")
+# O texto das consultas é limitado (constantes e variações de busca); acima disso, "outra"
+_MAX_NOMES = 1024
+_nomes: dict[str, str] = {}
+
+
+def nome_consulta(query: str) -> str:
+    nome = _nomes.get(query)
+    if nome is not None:
+        return nome
+    comentario = _COMENTARIO.match(query)
+    verbo = _VERBO.match(query)
+    if comentario:
+        nome = comentario.group(1)
+    elif _RESET.match(query):
+        nome = "reset_conexao"
+    elif _TRANSACAO.match(query):
+        nome = "transacao"
+    elif verbo:
+        v = verbo.group(1).lower()
+        v = "select" if v == "with" else v
+        tabela = _TABELA.get(v, _TABELA_FROM).search(query)
+        nome = f"{v}_{tabela.group(1)}" if tabela else v
+    else:
+        nome = "outra"
+    if len(_nomes) < _MAX_NOMES:
+        _nomes[query] = nome
+    return nome
+
+
+def registrar_consulta(registro) -> None:
+    """Logger de consultas do asyncpg (Connection.add_query_logger)"""
+    nome = nome_consulta(registro.query)
+    TEMPO_CONSULTA.labels(nome).observe(registro.elapsed)
+    if registro.exception is not None:
+        ERROS_CONSULTA.labels(nome).inc()
+
+
+# --- Requisições ---
+class MiddlewareMetricas:
+    """Middleware ASGI puro: mede até o último pedaço do corpo (vale para o NDJSON)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # O roteador do FastAPI grava a rota encontrada no próprio scope
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", None) or "nao_encontrada"
+            REQUISICOES.labels(scope["method"], caminho, str(status)).inc()
+            LATENCIA.labels(scope["method"], caminho).observe(time.perf_counter() - inicio)
+
+
+# --- Pools e caches (lidos na hora da coleta) ---
+class ColetorEstatisticas(Collector):
+    """Converte o estatisticas() dos pools e caches em séries do Prometheus"""
+
+    def __init__(self, pools: dict, caches: dict):
+        self.pools = pools
+        self.caches = caches
+
+    def collect(self):
+        conexoes = GaugeMetricFamily("hunter_db_pool_conexoes", "Conexões abertas no pool", labels=["pool", "estado"])
+        aguardando = GaugeMetricFamily("hunter_db_pool_aguardando", "Requisições esperando conexão", labels=["pool"])
+        esgotados = CounterMetricFamily(
+            "hunter_db_pool_esgotados", "Esperas que estouraram DB_ACQUIRE_TIMEOUT (503)", labels=["pool"]
+        )
+        for nome, pool in self.pools.items():
+            e = pool.estatisticas()
+            conexoes.add_metric([nome, "em_uso"], e["em_uso"])
+            conexoes.add_metric([nome, "ociosas"], e["ociosas"])
+            aguardando.add_metric([nome], e["aguardando"])
+            esgotados.add_metric([nome], e["esgotados"])
+        yield conexoes
+        yield aguardando
+        yield esgotados
+
+        itens = GaugeMetricFamily("hunter_cache_itens", "Itens no cache", labels=["cache"])
+        consultas = CounterMetricFamily("hunter_cache_consultas", "Consultas ao cache por resultado", labels=["cache", "resultado"])
+        expulsoes = CounterMetricFamily("hunter_cache_expulsoes", "Itens descartados pelo limite do LRU", labels=["cache"])
+        for nome, cache in self.caches.items():
+            e = cache.estatisticas()
+            itens.add_metric([nome], e["itens"])
+            consultas.add_metric([nome, "hit"], e["hits"])
+            consultas.add_metric([nome, "miss"], e["misses"])
+            expulsoes.add_metric([nome], e["expulsoes"])
+        yield itens
+        yield consultas
+        yield expulsoes
+
+
+_coletor: ColetorEstatisticas | None = None
+
+
+def registrar_coletor(pools: dict, caches: dict) -> None:
+    """Registra o coletor no startup; um novo registro substitui o anterior em vez de
+    duplicar as séries (app reimportado, lifespan iniciado de novo nos testes)"""
+    global _coletor
+    if _coletor is not None:
+        REGISTRY.unregister(_coletor)
+    _coletor = ColetorEstatisticas(pools, caches)
+    REGISTRY.register(_coletor)
@@ -0,0 +1,98 @@
+"""
+Benchmark do motor de alertas (motor_alertas.IndiceAlertas), sem banco de dados.
+
+Uso:
+    python bench_alertas.py --alertas 100000 --produtos 1000000 --alterados 0.01 [--completo]
+"""
+import argparse
+import random
+import time
+
+from motor_alertas import IndiceAlertas, tokenizar
+
+MARCAS = ["lg", "samsung", "dell", "aoc", "asus", "acer", "logitech", "redragon", "hyperx", "kingston",
+          "sandisk", "philips", "benq", "gigabyte", "msi", "razer", "corsair", "multilaser", "positivo", "lenovo"]
+TIPOS = ["monitor", "teclado", "mouse", "pendrive", "headset", "webcam", "ssd", "hd", "notebook", "cadeira"]
+ATRIBUTOS = ["gamer", "mecanico", "wireless", "rgb", "ultrawide", "curvo", "usb", "fullhd", "4k", "144hz",
+             "240hz", "ips", "va", "abnt2", "bluetooth", "32gb", "64gb", "128gb", "1tb", "27", "24", "32"]
+
+
+def gerar_nome(rng: random.Random) -> str:
+    partes = [rng.choice(TIPOS), rng.choice(MARCAS)] + rng.sample(ATRIBUTOS, 3)
+    partes.append(f"{rng.choice('abcdefgkmqxz')}{rng.randint(100, 9999)}")
+    return " ".join(partes)
+
+
+def gerar_alertas(n: int, rng: random.Random):
+    for alerta_id in range(1, n + 1):
+        termo = [rng.choice(TIPOS), rng.choice(MARCAS)]
+        if rng.random() < 0.5:
+            termo.append(rng.choice(ATRIBUTOS))
+        yield alerta_id, rng.randint(1, n // 10 + 1), " ".join(termo), rng.uniform(50, 3000)
+
+
+def gerar_produtos(n: int, rng: random.Random) -> list[dict]:
+    return [
+        {"origem": "kabum", "produto_id": i, "nome": gerar_nome(rng), "preco": rng.uniform(30, 5000)}
+        for i in range(1, n + 1)
+    ]
+
+
+def ingenuo(alertas, produtos) -> int:
+    """Referência: cada produto contra todos os alertas."""
+    termos = [(frozenset(tokenizar(produto)), preco) for _, _, produto, preco in alertas]
+    disparos = 0
+    for p in produtos:
+        tokens = set(tokenizar(p["nome"]))
+        for termo, preco in termos:
+            if p["preco"] <= preco and termo <= tokens:
+                disparos += 1
+    return disparos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do motor de alertas de preço")
+    parser.add_argument("--alertas", type=int, default=100_000)
+    parser.add_argument("--produtos", type=int, default=1_000_000)
+    parser.add_argument("--alterados", type=float, default=0.01, help="Fração dos produtos com preço alterado")
+    parser.add_argument("--completo", action="store_true", help="Também casa o catálogo inteiro")
+    parser.add_argument("--amostra-ingenuo", type=int, default=200, help="Produtos usados na referência ingênua")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    alertas = list(gerar_alertas(args.alertas, rng))
+    produtos = gerar_produtos(args.produtos, rng)
+
+    inicio = time.perf_counter()
+    indice = IndiceAlertas(alertas)
+    construcao = time.perf_counter() - inicio
+    print(f"Índice: {len(indice)} alertas em {construcao:.2f}s")
+
+    alterados = rng.sample(produtos, max(1, int(len(produtos) * args.alterados)))
+    inicio = time.perf_counter()
+    disparos = indice.corresponder(alterados)
+    lote = time.perf_counter() - inicio
+    print(f"Lote alterado: {len(alterados)} produtos, {len(disparos)} disparos em {lote:.3f}s "
+          f"({len(alterados) / lote:,.0f} produtos/s)")
+
+    if args.completo:
+        inicio = time.perf_counter()
+        total = len(indice.corresponder(produtos))
+        completo = time.perf_counter() - inicio
+        print(f"Catálogo completo: {len(produtos)} produtos, {total} disparos em {completo:.2f}s "
+              f"({len(produtos) / completo:,.0f} produtos/s)")
+
+    amostra = produtos[: args.amostra_ingenuo]
+    inicio = time.perf_counter()
+    esperado = ingenuo(alertas, amostra)
+    tempo_ingenuo = time.perf_counter() - inicio
+    obtido = len(indice.corresponder(amostra))
+    por_produto = tempo_ingenuo / len(amostra)
+    print(f"Ingênuo (alertas x produtos): {por_produto * 1000:.2f} ms/produto, "
+          f"estimativa p/ lote alterado {por_produto * len(alterados):.1f}s")
+    print(f"Conferência na amostra: índice={obtido} ingênuo={esperado} {'OK' if obtido == esperado else 'DIVERGENTE'}")
+
+
+if __name__ == "__main__":
+    main()
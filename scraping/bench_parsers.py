@@ -0,0 +1,76 @@
+"""
+Benchmark dos backends de parse (parsers.py) sobre páginas salvas, sem rede e sem banco.
+
+Cada arquivo em fixtures/ é associado à função de extração pelo prefixo do nome
+(kabum_listagem*, kabum_produto*, mercadolivre*); para medir com páginas reais,
+basta salvar o HTML da página com um desses prefixos.
+
+Uso:
+    python bench_parsers.py [--fixtures fixtures] [--repeticoes 50] [--parsers lxml selectolax]
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from parsers import BACKENDS
+from buscar_produtoskabum import extrair_cards, extrair_imagens_produto
+from buscar_produtosmercadolivre import extrair_itens
+
+EXTRATORES = {
+    "kabum_listagem": lambda html, parser: extrair_cards(html, "monitor", parser),
+    "kabum_produto": lambda html, parser: extrair_imagens_produto(html, parser),
+    "mercadolivre": lambda html, parser: extrair_itens(html, parser),
+}
+
+
+def carregar_fixtures(pasta: Path) -> list[tuple[str, str, str]]:
+    fixtures = []
+    for arquivo in sorted(pasta.glob("*.html")):
+        for prefixo in EXTRATORES:
+            if arquivo.name.startswith(prefixo):
+                fixtures.append((arquivo.name, prefixo, arquivo.read_text(encoding="utf-8")))
+                break
+    return fixtures
+
+
+def medir(extrator, html: str, parser: str, repeticoes: int) -> tuple[float, list]:
+    # Os prints de progresso das funções de extração ficam fora da saída
+    with redirect_stdout(io.StringIO()):
+        resultado = extrator(html, parser)  # aquece o cache de seletores
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            extrator(html, parser)
+    return (time.perf_counter() - inicio) / repeticoes, resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de parse de HTML")
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent / "fixtures")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--parsers", nargs="+", choices=sorted(BACKENDS), default=list(BACKENDS))
+    args = parser.parse_args()
+
+    fixtures = carregar_fixtures(args.fixtures)
+    if not fixtures:
+        raise SystemExit(f"Nenhuma fixture reconhecida em {args.fixtures}")
+
+    for nome, prefixo, html in fixtures:
+        extrator = EXTRATORES[prefixo]
+        referencia = None
+        print(f"\n{nome} ({len(html) / 1024:.0f} KiB)")
+        for backend in args.parsers:
+            por_pagina, resultado = medir(extrator, html, backend, args.repeticoes)
+            # Todos os backends devem extrair exatamente o mesmo que o primeiro
+            if referencia is None:
+                referencia = resultado
+            confere = "OK" if resultado == referencia else "DIVERGENTE"
+            print(
+                f"  {backend:<12} {por_pagina * 1000:8.2f} ms/página  "
+                f"{len(resultado) / por_pagina:10.0f} itens/s  {len(resultado):3d} itens  {confere}"
+            )
+
+
+if __name__ == "__main__":
+    main()
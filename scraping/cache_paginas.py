@@ -0,0 +1,102 @@
+"""
+Cache de páginas para re-scraping incremental.
+
+Guarda, por URL, o ETag/Last-Modified devolvidos pelo servidor e um hash do
+conteúdo. As requisições passam a ser condicionais (If-None-Match /
+If-Modified-Since) e páginas com o mesmo hash não são interpretadas de novo.
+"""
+import hashlib
+import re
+
+from sqlalchemy import text
+
+# Scripts, estilos e comentários mudam a cada resposta (tokens, timestamps) sem
+# mudar os produtos; ficam fora do hash
+_RUIDO = re.compile(r"<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->", re.S | re.I)
+_ESPACOS = re.compile(r"\s+")
+
+
+def hash_conteudo(html: str | bytes) -> str:
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "ignore")
+    limpo = _ESPACOS.sub(" ", _RUIDO.sub("", html)).strip()
+    return hashlib.sha256(limpo.encode("utf-8")).hexdigest()
+
+
+class CachePaginas:
+    def __init__(self, engine, ativo: bool = True):
+        self.engine = engine
+        # ativo=False força o download/parse completo, mas continua gravando os hashes
+        self.ativo = ativo
+        self.inalteradas = 0
+        self.alteradas = 0
+
+    def cabecalhos_condicionais(self, url: str) -> dict:
+        if not self.ativo:
+            return {}
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT etag, last_modified FROM cache_paginas WHERE url = :url"), {"url": url}
+            ).first()
+        if not row:
+            return {}
+        cabecalhos = {}
+        if row.etag:
+            cabecalhos["If-None-Match"] = row.etag
+        if row.last_modified:
+            cabecalhos["If-Modified-Since"] = row.last_modified
+        return cabecalhos
+
+    def nao_modificada(self, url: str) -> None:
+        """Registra uma resposta 304."""
+        self.inalteradas += 1
+        with self.engine.begin() as conn:
+            conn.execute(text("UPDATE cache_paginas SET verificado_em = NOW() WHERE url = :url"), {"url": url})
+
+    def verificar(self, url: str, conteudo: str | bytes) -> str | None:
+        """
+        Retorna o hash do conteúdo se a página mudou desde a última versão confirmada
+        (ou se o cache está desligado); None se não mudou.
+        """
+        novo_hash = hash_conteudo(conteudo)
+        if self.ativo:
+            with self.engine.begin() as conn:
+                inalterada = conn.execute(
+                    text(
+                        "UPDATE cache_paginas SET verificado_em = NOW() "
+                        "WHERE url = :url AND hash_conteudo = :hash RETURNING 1"
+                    ),
+                    {"url": url, "hash": novo_hash},
+                ).first()
+            if inalterada:
+                self.inalteradas += 1
+                return None
+
+        self.alteradas += 1
+        return novo_hash
+
+    def confirmar(
+        self, session, url: str, hash: str, etag: str | None = None, last_modified: str | None = None
+    ) -> None:
+        """
+        Grava a versão da página na transação que persistiu os produtos dela: se o
+        processo cair antes do commit, a página não fica marcada como vista.
+        """
+        session.execute(
+            text(
+                """
+                INSERT INTO cache_paginas (url, etag, last_modified, hash_conteudo)
+                VALUES (:url, :etag, :last_modified, :hash)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    hash_conteudo = EXCLUDED.hash_conteudo,
+                    verificado_em = NOW(),
+                    alterado_em = CASE
+                        WHEN cache_paginas.hash_conteudo = EXCLUDED.hash_conteudo THEN cache_paginas.alterado_em
+                        ELSE NOW()
+                    END
+                """
+            ),
+            {"url": url, "etag": etag, "last_modified": last_modified, "hash": hash},
+        )
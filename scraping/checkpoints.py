@@ -0,0 +1,48 @@
+"""
+Checkpoints das coletas: última página já gravada de cada (site, alvo).
+
+O checkpoint é gravado na mesma transação dos produtos da página, então uma
+execução interrompida recomeça exatamente depois do último lote confirmado.
+"""
+from sqlalchemy import text
+
+# Checkpoint mais velho que isso é de uma execução abandonada há muito tempo;
+# a coleta seguinte começa do zero
+CHECKPOINT_VALIDADE = 6 * 3600  # segundos
+
+
+def ler_checkpoint(session, site: str, alvo: str) -> int:
+    """Última página concluída de uma execução interrompida (0 se não houver)."""
+    pagina = session.execute(
+        text(
+            """
+            SELECT pagina FROM checkpoints_scraping
+            WHERE site = :site AND alvo = :alvo
+              AND atualizado_em > NOW() - make_interval(secs => :validade)
+            """
+        ),
+        {"site": site, "alvo": alvo, "validade": CHECKPOINT_VALIDADE},
+    ).scalar()
+    return pagina or 0
+
+
+def gravar_checkpoint(session, site: str, alvo: str, pagina: int) -> None:
+    """Registra `pagina` como concluída; vale quando a transação da sessão fizer commit."""
+    session.execute(
+        text(
+            """
+            INSERT INTO checkpoints_scraping (site, alvo, pagina, atualizado_em)
+            VALUES (:site, :alvo, :pagina, NOW())
+            ON CONFLICT (site, alvo) DO UPDATE SET pagina = EXCLUDED.pagina, atualizado_em = NOW()
+            """
+        ),
+        {"site": site, "alvo": alvo, "pagina": pagina},
+    )
+
+
+def limpar_checkpoint(session, site: str, alvo: str) -> None:
+    """A coleta do alvo terminou; a próxima começa da primeira página."""
+    session.execute(
+        text("DELETE FROM checkpoints_scraping WHERE site = :site AND alvo = :alvo"),
+        {"site": site, "alvo": alvo},
+    )
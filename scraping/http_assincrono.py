@@ -0,0 +1,140 @@
+"""
+Cliente HTTP assíncrono para os scrapers (aiohttp).
+
+- uma única ClientSession com pool de conexões keep-alive;
+- token bucket limitando a taxa de requisições;
+- novas tentativas com backoff exponencial em 429/5xx (respeita Retry-After);
+- estatísticas de latência por requisição (também nas métricas do scraper, metricas_scrapers.py).
+"""
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import aiohttp
+from multidict import CIMultiDict
+
+from metricas_scrapers import registrar_requisicao
+
+STATUS_REPETIR = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Libera até `taxa` requisições por segundo, com rajadas de até `capacidade`."""
+
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._atualizado = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self) -> None:
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+                self._atualizado = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+class EstatisticasLatencia:
+    def __init__(self):
+        self.latencias_ms: list[float] = []
+        self.por_status: dict[int | str, int] = {}
+        self.tentativas_extras = 0
+
+    def registrar(self, latencia_ms: float, status: int | str) -> None:
+        self.latencias_ms.append(latencia_ms)
+        self.por_status[status] = self.por_status.get(status, 0) + 1
+
+    def resumo(self) -> dict:
+        if not self.latencias_ms:
+            return {"requisicoes": 0}
+        ordenadas = sorted(self.latencias_ms)
+        return {
+            "requisicoes": len(ordenadas),
+            "tentativas_extras": self.tentativas_extras,
+            "por_status": dict(self.por_status),
+            "media_ms": round(statistics.fmean(ordenadas), 1),
+            "p50_ms": round(ordenadas[len(ordenadas) // 2], 1),
+            "p95_ms": round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))], 1),
+            "max_ms": round(ordenadas[-1], 1),
+        }
+
+
+class ClienteHttp:
+    """
+    Uso:
+        async with ClienteHttp(headers, taxa=2) as cliente:
+            status, html, headers = await cliente.get_texto(url)
+    """
+
+    def __init__(
+        self,
+        headers: dict,
+        taxa: float = 2.0,
+        rajada: int = 4,
+        max_conexoes: int = 8,
+        tentativas: int = 4,
+        backoff_base: float = 1.0,
+        timeout: float = 20,
+        site: str = "http",
+    ):
+        self.headers = headers
+        self.site = site  # rótulo nas métricas
+        self.max_conexoes = max_conexoes
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limitador = TokenBucket(taxa, rajada)
+        self.estatisticas = EstatisticasLatencia()
+        self._sessao: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> "ClienteHttp":
+        conector = aiohttp.TCPConnector(limit=self.max_conexoes, keepalive_timeout=30)
+        self._sessao = aiohttp.ClientSession(connector=conector, headers=self.headers, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._sessao.close()
+
+    def _espera(self, tentativa: int, retry_after: str | None) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_base * 2 ** tentativa + random.uniform(0, self.backoff_base)
+
+    async def get_texto(self, url: str, headers: dict | None = None) -> tuple[int | None, str | None, CIMultiDict]:
+        """
+        Retorna (status, corpo, headers da resposta). Status None indica falha de rede.
+        Os headers seguem sem distinção de maiúsculas (proxies HTTP/2 mandam "etag").
+        """
+        for tentativa in range(self.tentativas):
+            await self.limitador.adquirir()
+            inicio = time.perf_counter()
+            try:
+                async with self._sessao.get(url, headers=headers) as resp:
+                    corpo = await resp.text() if resp.status == 200 else None
+                    latencia = time.perf_counter() - inicio
+                    self.estatisticas.registrar(latencia * 1000, resp.status)
+                    registrar_requisicao(self.site, resp.status, latencia)
+                    if resp.status not in STATUS_REPETIR:
+                        return resp.status, corpo, resp.headers.copy()
+                    espera = self._espera(tentativa, resp.headers.get("Retry-After"))
+                    logging.warning("HTTP %s em %s; nova tentativa em %.1fs", resp.status, url, espera)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                latencia = time.perf_counter() - inicio
+                self.estatisticas.registrar(latencia * 1000, "erro")
+                registrar_requisicao(self.site, "erro", latencia)
+                espera = self._espera(tentativa, None)
+                logging.warning("Falha em %s (%s); nova tentativa em %.1fs", url, e, espera)
+
+            if tentativa + 1 < self.tentativas:
+                self.estatisticas.tentativas_extras += 1
+                await asyncio.sleep(espera)
+
+        return None, None, CIMultiDict()
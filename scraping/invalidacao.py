@@ -0,0 +1,15 @@
+from sqlalchemy import text
+
+# Mesmo canal escutado pela API (CANAL_PRODUTOS_ATUALIZADOS em busca.py)
+CANAL_PRODUTOS_ATUALIZADOS = "produtos_atualizados"
+
+
+def notificar_produtos_atualizados(session, origem: str) -> None:
+    """
+    Agenda um NOTIFY para a API invalidar o cache da busca.
+    O Postgres só entrega a notificação quando a transação da sessão faz commit.
+    """
+    session.execute(
+        text("SELECT pg_notify(:canal, :origem)"),
+        {"canal": CANAL_PRODUTOS_ATUALIZADOS, "origem": origem},
+    )
@@ -0,0 +1,60 @@
+"""
+Métricas dos scrapers no formato do Prometheus: páginas requisitadas, itens
+extraídos do HTML, produtos gravados e latência das requisições, por site.
+
+Com METRICAS_PORTA definida, iniciar_servidor() expõe /metrics nessa porta. No
+agendador (processo longo) é assim que se acompanham as coletas; num scraper
+avulso as séries só existem enquanto ele roda. Os contadores são seguros entre
+threads (modo paralelo da Kabum, jobs simultâneos do agendador).
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, start_http_server
+
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "0"))  # 0 = sem servidor
+
+PAGINAS = Counter(
+    "hunter_scraper_paginas_total", "Páginas requisitadas, por status HTTP (ou ok/erro no Selenium)", ["site", "resultado"]
+)
+LATENCIA = Histogram(
+    "hunter_scraper_requisicao_segundos", "Latência de cada requisição ou carregamento de página", ["site"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+ITENS = Counter("hunter_scraper_itens_total", "Produtos extraídos do HTML", ["site"])
+UPSERTS = Counter("hunter_scraper_upserts_total", "Produtos enviados ao upsert, por resultado", ["site", "resultado"])
+
+
+def registrar_requisicao(site: str, resultado: int | str, segundos: float) -> None:
+    PAGINAS.labels(site, str(resultado)).inc()
+    LATENCIA.labels(site).observe(segundos)
+
+
+@contextmanager
+def medir_requisicao(site: str):
+    """Mede um carregamento sem status HTTP (Selenium): resultado ok, ou erro se levantar exceção."""
+    inicio = time.perf_counter()
+    resultado = "erro"
+    try:
+        yield
+        resultado = "ok"
+    finally:
+        registrar_requisicao(site, resultado, time.perf_counter() - inicio)
+
+
+def registrar_itens(site: str, quantidade: int) -> None:
+    ITENS.labels(site).inc(quantidade)
+
+
+def registrar_upsert(site: str, resultado: dict) -> None:
+    """Recebe o retorno de persistencia.upsert_produtos."""
+    for chave in ("inseridos", "atualizados", "inalterados"):
+        UPSERTS.labels(site, chave).inc(resultado[chave])
+
+
+def iniciar_servidor(porta: int = METRICAS_PORTA) -> None:
+    if porta:
+        start_http_server(porta)
+        logging.info("Métricas dos scrapers em http://0.0.0.0:%s/metrics", porta)
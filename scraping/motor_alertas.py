@@ -0,0 +1,136 @@
+"""
+Motor incremental de alertas de preço.
+
+Os scrapers chamam `processar_alteracoes` com os produtos cujo preço mudou no lote;
+o custo é proporcional a esses produtos, não a alertas x produtos:
+
+- cada alerta é indexado por uma chave: o par com os dois tokens mais raros do termo
+  (ou o token único, em termos de uma palavra); o produto consulta seus tokens e pares;
+- cada lista do índice fica ordenada pelo preço-alvo, então para um produto de preço P
+  só os alertas com alvo >= P são visitados (busca binária);
+- o alerta só dispara se todos os tokens do termo aparecem no nome do produto.
+"""
+import bisect
+import itertools
+import logging
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+from sqlalchemy import text
+
+# Recarrega os alertas do banco depois desse tempo (alertas mudam pela API)
+MAX_IDADE_INDICE = 300  # segundos
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenizar(texto: str) -> list[str]:
+    """Mesma normalização do normalize_text do scraper da Kabum, em minúsculas."""
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN.findall(sem_acento.lower())
+
+
+class IndiceAlertas:
+    def __init__(self, alertas=()):
+        # chave (1 ou 2 tokens) -> [(preco_alvo, alerta_id)] ordenada por preço
+        self._por_chave: dict[tuple[str, ...], list[tuple[float, int]]] = defaultdict(list)
+        # alerta_id -> (usuario_id, tokens do termo)
+        self._alertas: dict[int, tuple[int, frozenset[str]]] = {}
+        self.carregado_em = time.monotonic()
+        self.construir(alertas)
+
+    def __len__(self) -> int:
+        return len(self._alertas)
+
+    def construir(self, alertas) -> None:
+        """`alertas`: iterável de (alerta_id, usuario_id, produto, preco)."""
+        termos = []
+        frequencia: Counter = Counter()
+        for alerta_id, usuario_id, produto, preco in alertas:
+            tokens = frozenset(tokenizar(produto))
+            if not tokens:
+                continue
+            termos.append((alerta_id, usuario_id, tokens, float(preco)))
+            frequencia.update(tokens)
+
+        for alerta_id, usuario_id, tokens, preco in termos:
+            raros = sorted(tokens, key=lambda t: (frequencia[t], t))[:2]
+            self._por_chave[tuple(sorted(raros))].append((preco, alerta_id))
+            self._alertas[alerta_id] = (usuario_id, tokens)
+
+        for lista in self._por_chave.values():
+            lista.sort()
+
+    @staticmethod
+    def _chaves(tokens: set[str]):
+        ordenados = sorted(tokens)
+        for token in ordenados:
+            yield (token,)
+        yield from itertools.combinations(ordenados, 2)
+
+    def corresponder(self, produtos) -> list[dict]:
+        """
+        `produtos`: iterável de dicts com origem, produto_id, nome e preco.
+        Retorna um dict por (alerta, produto) disparado.
+        """
+        disparos = []
+        for produto in produtos:
+            tokens = set(tokenizar(produto["nome"]))
+            preco = float(produto["preco"])
+            for chave in self._chaves(tokens):
+                lista = self._por_chave.get(chave)
+                if not lista:
+                    continue
+                inicio = bisect.bisect_left(lista, (preco, -1))
+                for _, alerta_id in lista[inicio:]:
+                    usuario_id, termo = self._alertas[alerta_id]
+                    if termo <= tokens:
+                        disparos.append(
+                            {
+                                "alerta_id": alerta_id,
+                                "usuario_id": usuario_id,
+                                "origem": produto["origem"],
+                                "produto_id": produto["produto_id"],
+                                "preco": preco,
+                            }
+                        )
+        return disparos
+
+
+_indice: IndiceAlertas | None = None
+
+
+def obter_indice(session) -> IndiceAlertas:
+    """Índice em memória do processo, recarregado a cada MAX_IDADE_INDICE segundos."""
+    global _indice
+    if _indice is None or time.monotonic() - _indice.carregado_em > MAX_IDADE_INDICE:
+        rows = session.execute(text("SELECT id, usuario_id, produto, preco FROM alertas_preco"))
+        _indice = IndiceAlertas(rows)
+        logging.info("Índice de alertas carregado com %s alertas.", len(_indice))
+    return _indice
+
+
+def processar_alteracoes(session, alterados: list[dict]) -> int:
+    """
+    Confere os produtos alterados contra os alertas e grava as notificações
+    na mesma transação da sessão. Retorna quantos disparos foram encontrados.
+    """
+    if not alterados:
+        return 0
+
+    disparos = obter_indice(session).corresponder(alterados)
+    if disparos:
+        session.execute(
+            text(
+                """
+                INSERT INTO notificacoes_alerta (alerta_id, usuario_id, origem, produto_id, preco)
+                VALUES (:alerta_id, :usuario_id, :origem, :produto_id, :preco)
+                ON CONFLICT (alerta_id, origem, produto_id, preco) DO NOTHING
+                """
+            ),
+            disparos,
+        )
+        logging.info("%s alertas de preço disparados.", len(disparos))
+    return len(disparos)
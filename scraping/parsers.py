@@ -0,0 +1,168 @@
+"""
+Backends de parse de HTML usados pelos scrapers.
+
+Todos expõem a mesma interface mínima (parse, todos, primeiro, texto, atributo),
+então as funções de extração de cada scraper não dependem do parser:
+
+- "html.parser": BeautifulSoup com o parser puro Python (sempre disponível);
+- "lxml": BeautifulSoup sobre o lxml (C), mesma árvore, parse bem mais rápido;
+- "selectolax": Lexbor (C), árvore própria e seletores CSS nativos; o mais rápido.
+
+Os seletores de cada layout ficam em LAYOUTS e são compilados uma vez por
+backend (soupsieve.compile no caso do BeautifulSoup), em vez de a cada card.
+"""
+import os
+from functools import lru_cache
+from types import SimpleNamespace
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+# Seletores por layout. Cada valor é um seletor CSS; as cadeias de fallback
+# (quando o site muda as classes) são tuplas, testadas em ordem.
+LAYOUTS = {
+    "kabum_listagem": {
+        "contador": "div#listingCount",
+        "card": "article[class*=productCard]",
+        "nome": "span[class*=nameCard]",
+        "preco": "span[class*=priceCard]",
+        "link": "a[href]",
+        "imagem": "img",
+        "json_ld": 'script[type="application/ld+json"]',
+    },
+    "kabum_produto": {
+        "miniaturas": (
+            "div[class*=thumb i] img, div[class*=miniatura i] img, "
+            "div[class*=carousel i] img, div[class*=gallery i] img"
+        ),
+        "area_produto": "div[class*=product i], div[class*=produto i]",
+        "imagem": "img",
+        "json_ld": 'script[type="application/ld+json"]',
+    },
+    "mercadolivre_busca": {
+        "card_antigo": "li.ui-search-layout__item",
+        "card_novo": "li.ui-search-result__wrapper",
+        "card_lista": "ol.ui-search-layout > li, ul.ui-search-layout > li",
+        "link": ("a.ui-search-link", "a.ui-search-result__content", "a[href]"),
+        "imagem": ("img.ui-search-result-image__element", "img.ui-search-result__image", "img"),
+        "preco": (
+            "span.ui-search-price__fraction",
+            "span.andes-money-amount__fraction",
+            "span.andes-money-amount__fraction--compact",
+            "span",
+        ),
+    },
+}
+
+
+class _BackendSoup:
+    def __init__(self, nome: str, construtor: str):
+        self.nome = nome
+        self.construtor = construtor
+
+    def compilar(self, css: str):
+        return soupsieve.compile(css)
+
+    def parse(self, html):
+        return BeautifulSoup(html, self.construtor)
+
+    def todos(self, no, seletor) -> list:
+        return seletor.select(no)
+
+    def primeiro(self, no, seletor):
+        return seletor.select_one(no)
+
+    def texto(self, no) -> str:
+        return no.get_text(strip=True)
+
+    def atributo(self, no, nome: str):
+        return no.get(nome)
+
+
+class _BackendSelectolax:
+    nome = "selectolax"
+
+    def compilar(self, css: str):
+        # O Lexbor compila o seletor na própria chamada; nada a fazer aqui
+        return css
+
+    def parse(self, html):
+        return LexborHTMLParser(html)
+
+    def todos(self, no, seletor) -> list:
+        return no.css(seletor)
+
+    def primeiro(self, no, seletor):
+        return no.css_first(seletor)
+
+    def texto(self, no) -> str:
+        return no.text(strip=True)
+
+    def atributo(self, no, nome: str):
+        return no.attributes.get(nome)
+
+
+BACKENDS = {"html.parser": _BackendSoup("html.parser", "html.parser")}
+if lxml is not None:
+    BACKENDS["lxml"] = _BackendSoup("lxml", "lxml")
+if LexborHTMLParser is not None:
+    BACKENDS["selectolax"] = _BackendSelectolax()
+
+# Sem SCRAPER_PARSER, usa o backend mais rápido instalado
+PARSER_PADRAO = os.getenv("SCRAPER_PARSER") or next(
+    nome for nome in ("selectolax", "lxml", "html.parser") if nome in BACKENDS
+)
+
+
+def obter_backend(nome: str | None = None):
+    nome = nome or PARSER_PADRAO
+    try:
+        return BACKENDS[nome]
+    except KeyError:
+        raise ValueError(
+            f"Parser '{nome}' indisponível; instalados: {', '.join(BACKENDS)}"
+        ) from None
+
+
+def definir_parser_padrao(nome: str) -> None:
+    """Troca o backend usado quando as funções de extração não recebem um (ex.: --parser)."""
+    global PARSER_PADRAO
+    obter_backend(nome)
+    PARSER_PADRAO = nome
+
+
+def seletores(layout: str, backend: str | None = None) -> SimpleNamespace:
+    """Seletores do layout já compilados para o backend."""
+    return _compilar(layout, backend or PARSER_PADRAO)
+
+
+@lru_cache(maxsize=None)
+def _compilar(layout: str, backend: str) -> SimpleNamespace:
+    b = obter_backend(backend)
+    compilados = {}
+    for chave, css in LAYOUTS[layout].items():
+        if isinstance(css, tuple):
+            compilados[chave] = tuple(b.compilar(c) for c in css)
+        else:
+            compilados[chave] = b.compilar(css)
+    return SimpleNamespace(**compilados)
+
+
+def primeiro_de(b, no, cadeia):
+    """Primeiro elemento encontrado pela cadeia de seletores de fallback."""
+    for seletor in cadeia:
+        encontrado = b.primeiro(no, seletor)
+        if encontrado is not None:
+            return encontrado
+    return None
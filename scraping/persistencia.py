@@ -0,0 +1,132 @@
+"""
+Gravação em lote dos produtos coletados.
+
+Cada lote vai para uma tabela temporária via COPY e é aplicado com um único
+INSERT ... ON CONFLICT (link), que também registra o histórico de preços.
+São 3 comandos por lote, independente do tamanho, no lugar de uma consulta
+ORM por item.
+"""
+import csv
+import io
+from urllib.parse import urlsplit, urlunsplit
+
+TABELAS = {"kabum": "produtos_kabum", "mercadolivre": "produtos_mercadolivre"}
+# Só a Kabum guarda a galeria completa
+COLUNAS_EXTRAS = {"kabum": ["imagens_urls"], "mercadolivre": []}
+
+
+def canonicalizar_link(link: str) -> str:
+    """
+    Remove fragmento e query string (rastreamento, posição na busca) do link.
+    Links de anúncio (click*.mercadolivre) dependem da query e só perdem o fragmento.
+    Equivale à função hunter_link_canonico de database_setup.sql.
+    """
+    partes = urlsplit(link.strip())
+    if partes.netloc.startswith("click"):
+        return urlunsplit(partes._replace(fragment=""))
+    return urlunsplit(partes._replace(query="", fragment=""))
+
+
+def _literal_array(valores: list[str]) -> str:
+    """Literal de array do Postgres ({"a","b"}) para o COPY de uma coluna TEXT[]."""
+    elementos = (v.replace("\\", "\\\\").replace('"', '\\"') for v in valores)
+    return "{" + ",".join(f'"{e}"' for e in elementos) + "}"
+
+
+def _sql_upsert(origem: str) -> str:
+    tabela = TABELAS[origem]
+    extras = COLUNAS_EXTRAS[origem]
+    colunas = ", ".join(["nome", "preco", "link", "imagem_url", *extras])
+    atualizacoes = ",\n            ".join(
+        ["nome = EXCLUDED.nome", "preco = EXCLUDED.preco", "imagem_url = COALESCE(EXCLUDED.imagem_url, p.imagem_url)"]
+        + [f"{c} = COALESCE(EXCLUDED.{c}, p.{c})" for c in extras]
+    )
+    atuais = ", ".join(["p.nome", "p.preco", "p.imagem_url", *[f"p.{c}" for c in extras]])
+    novos = ", ".join(
+        ["EXCLUDED.nome", "EXCLUDED.preco", "COALESCE(EXCLUDED.imagem_url, p.imagem_url)"]
+        + [f"COALESCE(EXCLUDED.{c}, p.{c})" for c in extras]
+    )
+    # Todos os CTEs enxergam o mesmo snapshot: "anteriores" traz os preços de antes do upsert
+    return f"""
+        WITH anteriores AS (
+            SELECT p.id, p.preco FROM {tabela} p JOIN stage_produtos s ON s.link = p.link
+        ),
+        gravados AS (
+            INSERT INTO {tabela} AS p ({colunas})
+            SELECT {colunas} FROM stage_produtos
+            ON CONFLICT (link) DO UPDATE SET
+            {atualizacoes}
+            WHERE ({atuais}) IS DISTINCT FROM ({novos})
+            RETURNING p.id, p.nome, p.preco, (xmax = 0) AS inserido
+        ),
+        alterados AS (
+            SELECT g.id, g.nome, g.preco, g.inserido
+            FROM gravados g LEFT JOIN anteriores a ON a.id = g.id
+            WHERE g.inserido OR a.preco IS DISTINCT FROM g.preco
+        ),
+        historico AS (
+            INSERT INTO historico_precos (origem, produto_id, preco)
+            SELECT '{origem}', id, preco FROM alterados
+        )
+        SELECT g.id, g.nome, g.preco, g.inserido, (al.id IS NOT NULL) AS preco_mudou
+        FROM gravados g LEFT JOIN alterados al ON al.id = g.id
+    """
+
+
+def upsert_produtos(session, origem: str, itens: list[dict]) -> dict:
+    """
+    Grava `itens` (nome, preco, link, imagem_url[, imagens_urls]) na tabela da
+    origem, dentro da transação da sessão (o commit fica com quem chamou).
+
+    Retorna as contagens de inseridos/atualizados/inalterados e a lista de
+    produtos cujo preço mudou (formato esperado por motor_alertas).
+    """
+    # Um item por link canônico; o último visto prevalece
+    por_link: dict[str, dict] = {}
+    for item in itens:
+        por_link[canonicalizar_link(item["link"])] = item
+
+    if not por_link:
+        return {"inseridos": 0, "atualizados": 0, "inalterados": 0, "alterados": []}
+
+    extras = COLUNAS_EXTRAS[origem]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for link, item in por_link.items():
+        linha = [item["nome"], item["preco"], link, item.get("imagem_url")]
+        if "imagens_urls" in extras:
+            imagens = item.get("imagens_urls")
+            linha.append(_literal_array(imagens) if imagens else None)
+        escritor.writerow(linha)
+    buffer.seek(0)
+
+    # Conexão DBAPI (psycopg2) da própria sessão: mesmo commit do restante do lote
+    cursor = session.connection().connection.cursor()
+    try:
+        # TRUNCATE: um lote anterior na mesma transação deixaria linhas na tabela
+        cursor.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS stage_produtos (
+                nome TEXT, preco NUMERIC(12,2), link TEXT, imagem_url TEXT, imagens_urls TEXT[]
+            ) ON COMMIT DELETE ROWS;
+            TRUNCATE stage_produtos;
+            """
+        )
+        colunas = ", ".join(["nome", "preco", "link", "imagem_url", *extras])
+        cursor.copy_expert(f"COPY stage_produtos ({colunas}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(_sql_upsert(origem))
+        gravados = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    inseridos = sum(1 for _, _, _, inserido, _ in gravados if inserido)
+    return {
+        "inseridos": inseridos,
+        "atualizados": len(gravados) - inseridos,
+        "inalterados": len(por_link) - len(gravados),
+        "alterados": [
+            {"origem": origem, "produto_id": produto_id, "nome": nome, "preco": float(preco)}
+            for produto_id, nome, preco, _, preco_mudou in gravados
+            if preco_mudou
+        ],
+    }
@@ -6,24 +6,53 @@ Antes de executar:
 2. Garanta que as variáveis de ambiente do banco estejam corretas ou ajuste a `DSN` padrão.
 3. Instale as dependências necessárias no ambiente virtual:
     `pip install psycopg2-binary firebase-admin`
+
+Com `--stream`, cada tabela é lida por um cursor do servidor (a memória não cresce
+com o tamanho da tabela), os lotes são gravados em paralelo com uma janela limitada
+e o último id migrado de cada tabela fica em um arquivo de checkpoint: rodar de novo
+migra só as linhas novas (`--restart` começa do zero). Para testar sem tocar no
+projeto real, use o emulador: `firebase emulators:start --only firestore` e
+`--emulator localhost:8080`.
+
+Com `--sync`, o script fica rodando e aplica no Firestore só o que mudou: os triggers
+de database_setup.sql registram cada inserção, alteração e exclusão em
+`alteracoes_sync` e avisam por NOTIFY. O registro é opt-in
+(`ALTER DATABASE hunter_db SET hunter.sync_firestore = 'on'`); rode uma carga
+completa (`--stream`) antes do primeiro `--sync`. Ao iniciar, o sync poda as
+entradas mais velhas que `--sync-retention` horas: depois de tanto tempo parado,
+refaça a carga completa.
 """
 
 from __future__ import annotations
 
 import argparse
+import json
 import logging
+import os
+import select
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Tuple
 
 import psycopg2
 import psycopg2.extras
 from firebase_admin import credentials, firestore, initialize_app
+from psycopg2 import sql
 from psycopg2.extensions import connection as PGConnection
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
 DEFAULT_DSN = "dbname=hunter_db user=postgres password=0608 host=localhost port=5432"
 DEFAULT_CREDENTIAL = Path("firebase-service-account.json")
+DEFAULT_CHECKPOINT = Path("migrate_checkpoint.json")
+# Limite do Firestore: 500 writes por batch
+MAX_BATCH_SIZE = 500
+# Canal do NOTIFY disparado pelos triggers de alteracoes_sync (database_setup.sql)
+SYNC_CHANNEL = "sync_firestore"
+# Alterações não consumidas por mais tempo que isso são podadas ao iniciar o --sync
+DEFAULT_SYNC_RETENTION_HOURS = 72.0
 
 
 def iter_batches(items: Iterable[Dict[str, Any]], size: int = 400) -> Iterator[List[Dict[str, Any]]]:
@@ -57,6 +86,13 @@ def bootstrap_firestore(credential_path: Path) -> firestore.Client:
     return firestore.client()
 
 
+def bootstrap_emulator(host: str, project: str) -> firestore.Client:
+    """Cliente apontando para o emulador do Firestore (não precisa de credenciais)."""
+    logging.info("Usando o emulador do Firestore em %s (projeto %s)...", host, project)
+    os.environ["FIRESTORE_EMULATOR_HOST"] = host
+    return firestore.Client(project=project)
+
+
 def fetch_table(conn: PGConnection, query: str) -> List[Dict[str, Any]]:
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         cur.execute(query)
@@ -64,58 +100,96 @@ def fetch_table(conn: PGConnection, query: str) -> List[Dict[str, Any]]:
         return [dict(row) for row in rows]
 
 
+DocBuilder = Callable[[firestore.Client, str, Dict[str, Any]], Tuple[Any, Dict[str, Any]]]
+
+# Feedbacks e alertas ficam em subcoleções do usuário
+SUBCOLLECTIONS = {"feedbacks", "alertas_preco"}
+
+
+def document_ref(db: firestore.Client, table: str, doc_id: int, usuario_id: int | None = None):
+    """Documento do Firestore que espelha a linha `doc_id` de `table`."""
+    if table in SUBCOLLECTIONS:
+        return db.collection("usuarios").document(str(usuario_id)).collection(table).document(str(doc_id))
+    # Usuários e produtos: coleção com o mesmo nome da tabela
+    return db.collection(table).document(str(doc_id))
+
+
+def user_doc(db: firestore.Client, table: str, row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    data = {
+        "nome": row["nome"],
+        "email": row["email"],
+        "senha": row["senha"],
+        "created_at": row["created_at"],
+    }
+    return document_ref(db, table, row["id"]), data
+
+
+def feedback_doc(db: firestore.Client, table: str, row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    data = {
+        "nome": row["nome"],
+        "email": row["email"],
+        "feedback": row["feedback"],
+        "data_envio": row["data_envio"],
+    }
+    return document_ref(db, table, row["id"], row["usuario_id"]), data
+
+
+def alerta_doc(db: firestore.Client, table: str, row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    data = {
+        "produto": row["produto"],
+        "preco": float(row["preco"]),
+        "created_at": row["created_at"],
+    }
+    return document_ref(db, table, row["id"], row["usuario_id"]), data
+
+
+def produto_doc(db: firestore.Client, table: str, row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    data = {
+        "nome": row["nome"],
+        "preco": float(row["preco"]),
+        "link": row["link"],
+        "imagem_url": row["imagem_url"],
+    }
+    return document_ref(db, table, row["id"]), data
+
+
+# Tabelas na ordem de migração (usuários antes das subcoleções)
+TABLES: Dict[str, DocBuilder] = {
+    "usuarios": user_doc,
+    "feedbacks": feedback_doc,
+    "alertas_preco": alerta_doc,
+    "produtos_kabum": produto_doc,
+    "produtos_mercadolivre": produto_doc,
+}
+
+
+def build_batch(db: firestore.Client, table: str, rows: List[Dict[str, Any]]):
+    batch_write = db.batch()
+    builder = TABLES[table]
+    for row in rows:
+        doc_ref, data = builder(db, table, row)
+        batch_write.set(doc_ref, data)
+    return batch_write
+
+
+def write_batches(db: firestore.Client, table: str, rows: List[Dict[str, Any]]) -> None:
+    for batch in iter_batches(rows):
+        build_batch(db, table, batch).commit()
+
+
 def migrate_users(db: firestore.Client, usuarios: List[Dict[str, Any]]) -> None:
     logging.info("Migrando %s usuários...", len(usuarios))
-    users_ref = db.collection("usuarios")
-    for batch in iter_batches(usuarios):
-        batch_write = db.batch()
-        for row in batch:
-            doc_ref = users_ref.document(str(row["id"]))
-            data = {
-                "nome": row["nome"],
-                "email": row["email"],
-                "senha": row["senha"],
-                "created_at": row["created_at"],
-            }
-            batch_write.set(doc_ref, data)
-        batch_write.commit()
+    write_batches(db, "usuarios", usuarios)
 
 
 def migrate_feedbacks(db: firestore.Client, feedbacks: List[Dict[str, Any]]) -> None:
     logging.info("Migrando %s feedbacks...", len(feedbacks))
-    for row in feedbacks:
-        doc_ref = (
-            db.collection("usuarios")
-            .document(str(row["usuario_id"]))
-            .collection("feedbacks")
-            .document(str(row["id"]))
-        )
-        doc_ref.set(
-            {
-                "nome": row["nome"],
-                "email": row["email"],
-                "feedback": row["feedback"],
-                "data_envio": row["data_envio"],
-            }
-        )
+    write_batches(db, "feedbacks", feedbacks)
 
 
 def migrate_alertas(db: firestore.Client, alertas: List[Dict[str, Any]]) -> None:
     logging.info("Migrando %s alertas de preço...", len(alertas))
-    for row in alertas:
-        doc_ref = (
-            db.collection("usuarios")
-            .document(str(row["usuario_id"]))
-            .collection("alertas_preco")
-            .document(str(row["id"]))
-        )
-        doc_ref.set(
-            {
-                "produto": row["produto"],
-                "preco": float(row["preco"]),
-                "created_at": row["created_at"],
-            }
-        )
+    write_batches(db, "alertas_preco", alertas)
 
 
 def migrate_produtos(
@@ -124,21 +198,237 @@ def migrate_produtos(
     collection_name: str,
 ) -> None:
     logging.info("Migrando %s produtos para %s...", len(produtos), collection_name)
-    col_ref = db.collection(collection_name)
-    for batch in iter_batches(produtos):
-        batch_write = db.batch()
-        for row in batch:
-            doc_ref = col_ref.document(str(row["id"]))
-            batch_write.set(
-                doc_ref,
-                {
-                    "nome": row["nome"],
-                    "preco": float(row["preco"]),
-                    "link": row["link"],
-                    "imagem_url": row["imagem_url"],
-                },
+    write_batches(db, collection_name, produtos)
+
+
+# --- Modo streaming ---
+class Checkpoint:
+    """Último id migrado de cada tabela, persistido em JSON a cada lote confirmado."""
+
+    def __init__(self, path: Path, restart: bool = False):
+        self.path = path
+        self.last_ids: Dict[str, int] = {}
+        if path.exists() and not restart:
+            self.last_ids = json.loads(path.read_text(encoding="utf-8"))
+
+    def get(self, table: str) -> int:
+        return self.last_ids.get(table, 0)
+
+    def set(self, table: str, last_id: int) -> None:
+        self.last_ids[table] = last_id
+        # Grava num temporário e troca: uma queda no meio não corrompe o arquivo
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.last_ids, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def stream_table(conn: PGConnection, table: str, after_id: int, itersize: int) -> Iterator[Dict[str, Any]]:
+    """Linhas com id > after_id, em ordem de id, via cursor do servidor (itersize por ida ao banco)."""
+    try:
+        with conn.cursor(name=f"migrate_{table}", cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.itersize = itersize
+            cur.execute(
+                sql.SQL("SELECT * FROM {} WHERE id > %s ORDER BY id").format(sql.Identifier(table)),
+                (after_id,),
+            )
+            for row in cur:
+                yield dict(row)
+    finally:
+        # Só leitura: encerra a transação (e o snapshot) aberta pelo cursor
+        conn.rollback()
+
+
+def migrate_table_stream(
+    db: firestore.Client,
+    conn: PGConnection,
+    table: str,
+    checkpoint: Checkpoint,
+    executor: ThreadPoolExecutor,
+    batch_size: int,
+    max_in_flight: int,
+) -> int:
+    """
+    Migra uma tabela em lotes commitados em paralelo (no máximo max_in_flight ao mesmo
+    tempo). O checkpoint só avança na ordem dos lotes: se um falhar, os seguintes já
+    gravados são regravados na próxima execução (set é idempotente).
+    """
+    after_id = checkpoint.get(table)
+    logging.info("Migrando %s a partir do id %s...", table, after_id)
+    pending: Deque[Tuple[Future, int, int]] = deque()
+    migrated = 0
+    started = time.perf_counter()
+
+    def confirm(limit: int) -> None:
+        nonlocal migrated
+        while len(pending) > limit:
+            future, last_id, count = pending.popleft()
+            future.result()
+            migrated += count
+            checkpoint.set(table, last_id)
+
+    rows = stream_table(conn, table, after_id, batch_size)
+    try:
+        for batch in iter_batches(rows, batch_size):
+            batch_write = build_batch(db, table, batch)
+            pending.append((executor.submit(batch_write.commit), batch[-1]["id"], len(batch)))
+            confirm(max_in_flight - 1)
+        confirm(0)
+    finally:
+        rows.close()
+
+    elapsed = time.perf_counter() - started
+    logging.info(
+        "%s: %s documentos em %.1fs (%.0f/s).", table, migrated, elapsed, migrated / elapsed if elapsed else 0
+    )
+    return migrated
+
+
+def migrate_stream(
+    db: firestore.Client,
+    conn: PGConnection,
+    tables: List[str],
+    checkpoint: Checkpoint,
+    batch_size: int,
+    max_in_flight: int,
+) -> None:
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="firestore") as executor:
+        for table in tables:
+            migrate_table_stream(db, conn, table, checkpoint, executor, batch_size, max_in_flight)
+
+
+# --- Modo sync (contínuo) ---
+def consume_changes(db: firestore.Client, conn: PGConnection, limit: int) -> int:
+    """
+    Aplica no Firestore até `limit` entradas de alteracoes_sync e as apaga.
+
+    As entradas são apagadas na mesma transação que só faz commit depois que os
+    batches do Firestore foram confirmados: se o sync cair no meio, elas voltam a
+    ficar visíveis e são reaplicadas (set/delete são idempotentes). Várias entradas
+    do mesmo registro viram uma só escrita, com o estado atual da linha.
+    Retorna quantas entradas foram consumidas.
+    """
+    with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(
+            """
+            DELETE FROM alteracoes_sync
+            WHERE id IN (SELECT id FROM alteracoes_sync ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+            RETURNING id, tabela, registro_id, usuario_id, excluido
+            """,
+            (limit,),
+        )
+        entries = sorted(cur.fetchall(), key=lambda e: e["id"])
+        if not entries:
+            return 0
+
+        # Coalescência: fica a última entrada de cada registro
+        latest: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for entry in entries:
+            latest[(entry["tabela"], entry["registro_id"])] = entry
+
+        # Estado atual das linhas alteradas; a que não existe mais é exclusão
+        current: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        by_table: Dict[str, List[int]] = {}
+        for (table, registro_id), entry in latest.items():
+            if not entry["excluido"]:
+                by_table.setdefault(table, []).append(registro_id)
+        for table, ids in by_table.items():
+            cur.execute(sql.SQL("SELECT * FROM {} WHERE id = ANY(%s)").format(sql.Identifier(table)), (ids,))
+            for row in cur:
+                current[(table, row["id"])] = dict(row)
+
+        writes = []
+        for key, entry in latest.items():
+            row = current.get(key)
+            if row is not None:
+                writes.append(("set", *TABLES[entry["tabela"]](db, entry["tabela"], row)))
+            else:
+                writes.append(("delete", document_ref(db, entry["tabela"], entry["registro_id"], entry["usuario_id"]), None))
+
+        for batch in iter_batches(writes, MAX_BATCH_SIZE):
+            batch_write = db.batch()
+            for op, doc_ref, data in batch:
+                if op == "set":
+                    batch_write.set(doc_ref, data)
+                else:
+                    batch_write.delete(doc_ref)
+            batch_write.commit()
+
+        deleted = sum(1 for op, _, _ in writes if op == "delete")
+        logging.info(
+            "Sync: %s alterações -> %s escritas (%s exclusões).", len(entries), len(writes), deleted
+        )
+        return len(entries)
+
+
+def wait_notify(listen_conn: PGConnection, timeout: float) -> bool:
+    """Espera um NOTIFY de sync_firestore por até `timeout` segundos."""
+    if select.select([listen_conn], [], [], timeout) == ([], [], []):
+        return False
+    listen_conn.poll()
+    listen_conn.notifies.clear()
+    return True
+
+
+def prepare_sync(conn: PGConnection, retention_hours: float) -> None:
+    """Avisa se o registro de alterações está desligado e poda entradas velhas demais."""
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT current_setting('hunter.sync_firestore', true)")
+        if cur.fetchone()[0] != "on":
+            logging.warning(
+                "hunter.sync_firestore não está 'on': os triggers não registram alterações "
+                "(ALTER DATABASE ... SET hunter.sync_firestore = 'on')."
+            )
+        cur.execute(
+            "DELETE FROM alteracoes_sync WHERE alterado_em < NOW() - make_interval(secs => %s)",
+            (retention_hours * 3600,),
+        )
+        if cur.rowcount:
+            logging.warning(
+                "%s alterações com mais de %sh descartadas; rode uma carga completa (--stream).",
+                cur.rowcount, retention_hours,
             )
-        batch_write.commit()
+
+
+def sync_forever(
+    db: firestore.Client,
+    conn: PGConnection,
+    dsn: str,
+    limit: int,
+    coalesce: float,
+    poll_interval: float,
+    retention_hours: float = DEFAULT_SYNC_RETENTION_HOURS,
+) -> None:
+    """
+    Laço do --sync: acorda com o NOTIFY dos triggers (ou a cada poll_interval, caso
+    algum se perca), espera `coalesce` segundos para juntar rajadas (um lote de
+    scraper gera muitas alterações seguidas) e consome o log até esvaziar.
+    """
+    prepare_sync(conn, retention_hours)
+    listen_conn = psycopg2.connect(dsn)
+    listen_conn.autocommit = True
+    listen_conn.cursor().execute(f"LISTEN {SYNC_CHANNEL}")
+    logging.info("Sync contínuo iniciado (LISTEN %s).", SYNC_CHANNEL)
+    failures = 0
+    try:
+        while True:
+            try:
+                while consume_changes(db, conn, limit) == limit:
+                    pass
+                failures = 0
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except Exception:
+                # Firestore indisponível: as entradas continuam no log; tenta de novo com backoff
+                failures += 1
+                logging.exception("Falha no sync; nova tentativa em %ss.", min(2 ** failures, 60))
+                time.sleep(min(2 ** failures, 60))
+                continue
+
+            if wait_notify(listen_conn, poll_interval):
+                time.sleep(coalesce)
+                wait_notify(listen_conn, 0)
+    finally:
+        listen_conn.close()
 
 
 def parse_args() -> argparse.Namespace:
@@ -150,16 +440,58 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_CREDENTIAL,
         help="Caminho para o JSON da conta de serviço do Firebase",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--emulator",
+        metavar="HOST:PORTA",
+        default=os.getenv("FIRESTORE_EMULATOR_HOST"),
+        help="Gravar no emulador do Firestore em vez do projeto real",
+    )
+    parser.add_argument("--project", default="hunter-local", help="ID do projeto usado no emulador")
+    parser.add_argument("--stream", action="store_true", help="Cursor do servidor, lotes em paralelo e checkpoint")
+    parser.add_argument(
+        "--sync", action="store_true", help="Sincronização contínua: aplica só as alterações (alteracoes_sync)"
+    )
+    parser.add_argument("--sync-batch", type=int, default=2000, help="Alterações consumidas por transação (--sync)")
+    parser.add_argument(
+        "--coalesce", type=float, default=1.0, help="Segundos esperando mais alterações após um NOTIFY (--sync)"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=30.0, help="Verificação do log mesmo sem NOTIFY, em segundos (--sync)"
+    )
+    parser.add_argument(
+        "--sync-retention", type=float, default=DEFAULT_SYNC_RETENTION_HOURS, help="Horas que uma alteração não consumida é mantida (--sync)"
+    )
+    parser.add_argument("--batch-size", type=int, default=400, help=f"Documentos por batch (máx. {MAX_BATCH_SIZE})")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Batches sendo gravados ao mesmo tempo")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT, help="Arquivo de checkpoint (--stream)")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e migra tudo de novo")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES), help="Tabelas a migrar (--stream)")
+    args = parser.parse_args()
+    if not 1 <= args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f"--batch-size deve estar entre 1 e {MAX_BATCH_SIZE}")
+    if args.max_in_flight < 1:
+        parser.error("--max-in-flight deve ser pelo menos 1")
+    return args
 
 
 def main() -> None:
     args = parse_args()
 
     conn = connect_postgres(args.dsn)
-    db = bootstrap_firestore(args.credentials)
+    if args.emulator:
+        db = bootstrap_emulator(args.emulator, args.project)
+    else:
+        db = bootstrap_firestore(args.credentials)
 
     try:
+        if args.stream:
+            checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+            migrate_stream(db, conn, args.tables, checkpoint, args.batch_size, args.max_in_flight)
+            return
+        if args.sync:
+            sync_forever(db, conn, args.dsn, args.sync_batch, args.coalesce, args.poll_interval, args.sync_retention)
+            return
+
         usuarios = fetch_table(conn, "SELECT * FROM usuarios")
         feedbacks = fetch_table(conn, "SELECT * FROM feedbacks")
         alertas = fetch_table(conn, "SELECT * FROM alertas_preco")
@@ -0,0 +1,120 @@
+# sessoes.py
+"""Sessões de login com refresh tokens rotativos (tabelas sessoes e refresh_tokens).
+
+- o login abre uma sessão e devolve o access token (com o id da sessão em `sid`)
+  e um refresh token opaco, guardado no banco só como sha256;
+- /token/refresh troca o refresh token por um par novo da mesma sessão e marca o
+  anterior como usado;
+- reapresentar um refresh token já usado indica que ele vazou: a sessão inteira
+  é revogada, tanto para quem roubou quanto para o dono;
+- revogações valem na hora neste processo (auth.revogacoes) e nos demais workers
+  na próxima recarga da lista (REVOGACAO_INTERVALO).
+"""
+import hashlib
+import logging
+import os
+import secrets
+
+from fastapi import HTTPException
+
+from auth import create_access_token, revogacoes
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+
+def refresh_invalido() -> HTTPException:
+    """Uma exceção nova por falha, como auth.token_invalido"""
+    return HTTPException(
+        status_code=401,
+        detail="Refresh token inválido ou expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+SQL_REFRESH = """
+    SELECT t.sessao_id, t.usado_em IS NOT NULL AS usado, t.expira_em <= NOW() AS expirado,
+           s.revogada_em IS NOT NULL AS revogada, s.usuario_id, u.email
+    FROM refresh_tokens t
+    JOIN sessoes s ON s.id = t.sessao_id
+    JOIN usuarios u ON u.id = s.usuario_id
+    WHERE t.token_hash = $1
+    FOR UPDATE OF t
+"""
+
+# Sessões cujos refresh tokens já expiraram todos: os access tokens delas também
+SQL_LIMPAR_SESSOES = """
+    DELETE FROM sessoes s
+    WHERE s.usuario_id = $1
+      AND NOT EXISTS (SELECT 1 FROM refresh_tokens t WHERE t.sessao_id = s.id AND t.expira_em > NOW())
+"""
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _emitir_refresh(conn, sessao_id: int) -> str:
+    token = secrets.token_urlsafe(32)
+    await conn.execute(
+        "INSERT INTO refresh_tokens (token_hash, sessao_id, expira_em) "
+        "VALUES ($1, $2, NOW() + make_interval(days => $3))",
+        _hash(token), sessao_id, REFRESH_TOKEN_EXPIRE_DAYS,
+    )
+    return token
+
+
+def _resposta(email: str, usuario_id: int, sessao_id: int, refresh_token: str) -> dict:
+    access_token = create_access_token(data={"sub": email, "uid": usuario_id, "sid": sessao_id})
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+async def abrir_sessao(conn, usuario_id: int, email: str) -> dict:
+    """Cria a sessão do login e devolve access + refresh token"""
+    async with conn.transaction():
+        await conn.execute(SQL_LIMPAR_SESSOES, usuario_id)
+        sessao_id = await conn.fetchval("INSERT INTO sessoes (usuario_id) VALUES ($1) RETURNING id", usuario_id)
+        refresh_token = await _emitir_refresh(conn, sessao_id)
+    return _resposta(email, usuario_id, sessao_id, refresh_token)
+
+
+async def renovar_sessao(conn, refresh_token: str) -> dict:
+    """Troca o refresh token por um par novo; token reutilizado revoga a sessão"""
+    novo = None
+    async with conn.transaction():
+        # FOR UPDATE: dois refresh simultâneos com o mesmo token não geram dois pares
+        row = await conn.fetchrow(SQL_REFRESH, _hash(refresh_token))
+        if row is None or row["revogada"] or row["expirado"]:
+            raise refresh_invalido()
+        if row["usado"]:
+            await revogar_sessao(conn, row["sessao_id"], "reuso")
+        else:
+            await conn.execute("UPDATE refresh_tokens SET usado_em = NOW() WHERE token_hash = $1", _hash(refresh_token))
+            novo = await _emitir_refresh(conn, row["sessao_id"])
+
+    # A revogação por reuso precisa ser confirmada antes de responder 401
+    if novo is None:
+        logging.warning("Refresh token reutilizado: sessão %s do usuário %s revogada.", row["sessao_id"], row["usuario_id"])
+        raise refresh_invalido()
+    return _resposta(row["email"], row["usuario_id"], row["sessao_id"], novo)
+
+
+async def revogar_sessao(conn, sessao_id: int, motivo: str) -> None:
+    await conn.execute(
+        "UPDATE sessoes SET revogada_em = NOW(), motivo = $2 WHERE id = $1 AND revogada_em IS NULL",
+        sessao_id, motivo,
+    )
+    revogacoes.revogar(sessao_id)
+
+
+async def revogar_sessoes(conn, usuario_id: int, motivo: str, exceto: int | None = None) -> int:
+    """Revoga as sessões abertas do usuário (menos `exceto`); devolve quantas"""
+    linhas = await conn.fetch(
+        """
+        UPDATE sessoes SET revogada_em = NOW(), motivo = $2
+        WHERE usuario_id = $1 AND revogada_em IS NULL AND id IS DISTINCT FROM $3
+        RETURNING id
+        """,
+        usuario_id, motivo, exceto,
+    )
+    revogacoes.revogar(*(r["id"] for r in linhas))
+    return len(linhas)
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+# Módulos da API (raiz) e dos scrapers, que se importam pelo nome (from persistencia import ...)
+sys.path[:0] = [str(RAIZ), str(RAIZ / "scraping")]
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _token_sem_kid(segredo: str) -> str:
+    return jwt.encode({"sub": "a@hunter.com", "exp": 4102444800}, segredo, algorithm=auth.ALGORITHM)
+
+
+def test_token_sem_kid_vale_enquanto_secret_key_esta_nas_chaves():
+    assert auth.decodificar_token(_token_sem_kid(auth.SECRET_KEY))["sub"] == "a@hunter.com"
+
+
+def test_token_sem_kid_rejeitado_depois_da_rotacao():
+    # As chaves são lidas no import: roda num processo com JWT_KEYS sem a SECRET_KEY
+    codigo = (
+        "import auth\n"
+        "from jose import jwt\n"
+        "t = jwt.encode({'sub': 'a', 'exp': 4102444800}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)\n"
+        "try:\n"
+        "    auth.decodificar_token(t)\n"
+        "except Exception as e:\n"
+        "    print(getattr(e, 'status_code', e))\n"
+        "novo = auth.create_access_token({'sub': 'b'})\n"
+        "print(auth.decodificar_token(novo)['sub'])\n"
+    )
+    ambiente = {**os.environ, "JWT_KEYS": "k2026:segredo-novo", "JWT_KID_ATIVO": "k2026"}
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert saida == ["401", "b"]
+
+
+def test_cada_falha_levanta_uma_excecao_nova():
+    excecoes = []
+    for _ in range(2):
+        with pytest.raises(HTTPException) as info:
+            auth.decodificar_token("nao-e-um-jwt")
+        excecoes.append(info.value)
+    assert excecoes[0] is not excecoes[1]
+    assert auth.token_invalido().__traceback__ is None
+
+
+def test_token_expirado_sai_do_cache():
+    token = auth.create_access_token({"sub": "c@hunter.com"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        auth.verificar_token(token)
+    assert auth.cache_tokens.get(token) is None
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+from decimal import Decimal
+
+import pytest
+
+from busca import (
+    PLANO_FTS,
+    codificar_cursor,
+    decodificar_cursor,
+    formatar_grupo,
+    montar_consulta,
+    montar_consulta_agrupada,
+    paginar,
+    transmitir_produtos,
+)
+
+# Banco com o database_setup.sql aplicado; sem ele, só os testes puros rodam
+DATABASE_URL_TESTE = os.getenv("HUNTER_TEST_DATABASE_URL")
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor({"preco": Decimal("1299.90"), "id": 42, "origem": "kabum"})
+    assert decodificar_cursor(cursor) == (Decimal("1299.90"), 42, "kabum")
+
+
+@pytest.mark.parametrize("cursor", ["", "nao-e-base64!", codificar_cursor({"preco": "x", "id": "y", "origem": 1})])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_keyset_continua_do_cursor_e_busca_uma_linha_a_mais():
+    query, args = montar_consulta("monitor", PLANO_FTS, limite=10, cursor=(Decimal("10.00"), 5, "kabum"))
+    assert "(preco, produto_id, origem) > ($2::numeric, $3::integer, $4::varchar)" in query
+    assert args == ["monitor", Decimal("10.00"), 5, "kabum", 11]
+
+
+def test_paginar_so_gera_cursor_quando_ha_mais():
+    rows = [{"preco": Decimal(p), "id": p, "origem": "kabum"} for p in (1, 2, 3)]
+    assert paginar(rows, 3) == (rows, None)
+    pagina, cursor = paginar(rows, 2)
+    assert pagina == rows[:2] and decodificar_cursor(cursor) == (Decimal(2), 2, "kabum")
+    assert paginar(rows, 2, ordem="relevancia") == (rows[:2], None)
+
+
+def test_agrupada_limita_representantes_antes_dos_grupos():
+    query, args = montar_consulta_agrupada("monitor", PLANO_FTS, limite=10, cursor=(Decimal("10.00"), 5, "kabum"))
+    representantes = query.split("WITH representantes AS", 1)[1].split("SELECT r.id", 1)[0]
+    assert "(b.preco, b.produto_id, b.origem) > ($2::numeric" in representantes
+    assert "LIMIT $5" in representantes and args[-1] == 11
+
+
+class PoolFalso:
+    """pool.acquire() de asyncpg com um cursor do servidor sobre linhas fixas"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def acquire(self):
+        pool = self
+
+        class Conexao:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def transaction(self):
+                return self
+
+            async def cursor(self, query, *args, prefetch=None):
+                for r in pool.rows:
+                    yield r
+
+        return Conexao()
+
+
+async def _linhas_ndjson(rows, limite, ordem="preco") -> list[dict]:
+    return [json.loads(linha) async for linha in transmitir_produtos(PoolFalso(rows), "", [], limite, False, ordem)]
+
+
+def test_ndjson_termina_com_next_cursor_quando_ha_mais():
+    rows = [
+        {"id": i, "nome": f"p{i}", "preco": Decimal(i), "link": "l", "imagem_url": None, "origem": "kabum"}
+        for i in (1, 2, 3)
+    ]
+    linhas = asyncio.run(_linhas_ndjson(rows, 2))
+    assert [l.get("id") for l in linhas[:2]] == ["1", "2"]
+    assert decodificar_cursor(linhas[2]["next_cursor"]) == (Decimal(2), 2, "kabum")
+    assert len(asyncio.run(_linhas_ndjson(rows, 3))) == 3  # sem linha extra, sem cursor
+    assert len(asyncio.run(_linhas_ndjson(rows, 2, ordem="relevancia"))) == 2
+
+
+PRODUTOS = [
+    # (tabela, nome, preço, grupo)
+    ("produtos_kabum", "Monitor LG 24MK430H IPS", 799, "lg"),
+    ("produtos_mercadolivre", "Monitor Lg 24mk430h Ips Full Hd", 759, "lg"),
+    ("produtos_mercadolivre", "Monitor LG 24MK430H 24 IPS", 820, "lg"),
+    ("produtos_kabum", "Monitor Samsung LF22T350", 650, "samsung"),
+    ("produtos_mercadolivre", "Monitor Samsung LF22T350 Full HD", 640, "samsung"),
+    ("produtos_kabum", "Monitor AOC 24B1XH", 700, None),
+    ("produtos_kabum", "Mouse Logitech G203", 99, None),
+]
+
+
+async def _paginas_agrupadas(limite: int) -> list[dict]:
+    import asyncpg
+
+    conn = await asyncpg.connect(DATABASE_URL_TESTE)
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    transacao = conn.transaction()
+    await transacao.start()
+    try:
+        await conn.execute("DELETE FROM grupos_produtos; DELETE FROM produtos_kabum; DELETE FROM produtos_mercadolivre")
+        grupos = {}
+        for tabela, nome, preco, grupo in PRODUTOS:
+            produto_id = await conn.fetchval(
+                f"INSERT INTO {tabela} (nome, preco, link) VALUES ($1, $2, $1) RETURNING id", nome, preco
+            )
+            if grupo:
+                if grupo not in grupos:
+                    grupos[grupo] = await conn.fetchval("INSERT INTO grupos_produtos (nome) VALUES ($1) RETURNING id", grupo)
+                await conn.execute(
+                    "INSERT INTO grupos_produtos_membros (origem, produto_id, grupo_id) VALUES ($1, $2, $3)",
+                    tabela.removeprefix("produtos_"), produto_id, grupos[grupo],
+                )
+
+        resultado, cursor = [], None
+        while True:
+            query, args = montar_consulta_agrupada("monitor", PLANO_FTS, limite=limite, cursor=cursor)
+            rows = await conn.fetch(query, *args)
+            pagina, proximo = paginar(rows, limite)
+            resultado.extend(formatar_grupo(r) for r in pagina)
+            if not proximo:
+                return resultado
+            cursor = decodificar_cursor(proximo)
+    finally:
+        await transacao.rollback()
+        await conn.close()
+
+
+@pytest.mark.parametrize("limite", [1, 2, 10])
+def test_agrupada_pagina_cada_grupo_uma_vez_pelo_menor_preco(limite):
+    if not DATABASE_URL_TESTE:
+        pytest.skip("HUNTER_TEST_DATABASE_URL não definido")
+    grupos = asyncio.run(_paginas_agrupadas(limite))
+    assert [(g["nome"], g["menor_preco"]) for g in grupos] == [
+        ("samsung", 640.0), ("Monitor AOC 24B1XH", 700.0), ("lg", 759.0)
+    ]
+    assert [len(g["ofertas"]) for g in grupos] == [2, 1, 3]
+    assert grupos[2]["precos_por_loja"] == {"Mercado Livre": 759.0, "Kabum": 799.0}
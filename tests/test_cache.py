@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from cache import CacheTTL
+
+
+def test_lru_expulsa_o_menos_usado():
+    cache = CacheTTL(max_itens=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser o mais recente
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.expulsoes == 1
+
+
+def test_ttl_expira(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: agora[0])
+    cache = CacheTTL(ttl=10)
+    cache.set("a", 1)
+    agora[0] += 9
+    assert cache.get("a") == 1
+    agora[0] += 2
+    assert cache.get("a") is None
+
+
+def test_cargas_concorrentes_sao_coalescidas():
+    async def cenario():
+        cache = CacheTTL()
+        chamadas = 0
+
+        async def carregar():
+            nonlocal chamadas
+            chamadas += 1
+            await asyncio.sleep(0.01)
+            return "valor"
+
+        resultados = await asyncio.gather(*(cache.obter_ou_carregar("k", carregar) for _ in range(5)))
+        return cache, chamadas, resultados
+
+    cache, chamadas, resultados = asyncio.run(cenario())
+    assert chamadas == 1
+    assert resultados == ["valor"] * 5
+    assert cache.coalescidos == 4
+    assert cache.get("k") == "valor"
+
+
+def test_cancelar_quem_iniciou_nao_derruba_os_demais():
+    async def cenario():
+        cache = CacheTTL()
+        liberar = asyncio.Event()
+
+        async def carregar():
+            await liberar.wait()
+            return 42
+
+        primeiro = asyncio.create_task(cache.obter_ou_carregar("k", carregar))
+        await asyncio.sleep(0)
+        segundo = asyncio.create_task(cache.obter_ou_carregar("k", carregar))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+        await asyncio.sleep(0)
+        liberar.set()
+        with pytest.raises(asyncio.CancelledError):
+            await primeiro
+        return await segundo, cache.get("k")
+
+    assert asyncio.run(cenario()) == (42, 42)
+
+
+def test_erro_na_carga_chega_a_todos_e_nao_fica_em_cache():
+    async def cenario():
+        cache = CacheTTL()
+
+        async def carregar():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("banco fora")
+
+        resultados = await asyncio.gather(
+            *(cache.obter_ou_carregar("k", carregar) for _ in range(3)), return_exceptions=True
+        )
+        return cache, resultados
+
+    cache, resultados = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+    assert cache.get("k") is None
+    assert not cache._pendentes
+
+
+def test_invalidacao_durante_a_carga_descarta_o_resultado():
+    async def cenario():
+        cache = CacheTTL()
+
+        async def carregar():
+            cache.invalidar()  # NOTIFY chegou enquanto a consulta rodava
+            return "velho"
+
+        valor = await cache.obter_ou_carregar("k", carregar)
+        return valor, cache.get("k")
+
+    assert asyncio.run(cenario()) == ("velho", None)
+
+
+def test_depois_da_invalidacao_nao_coalesce_com_a_carga_antiga():
+    async def cenario():
+        cache = CacheTTL()
+        liberar = asyncio.Event()
+        valores = iter(["velho", "novo"])
+
+        async def carregar():
+            valor = next(valores)
+            await liberar.wait()
+            return valor
+
+        antiga = asyncio.create_task(cache.obter_ou_carregar("k", carregar))
+        await asyncio.sleep(0)
+        cache.invalidar()  # scraper gravou enquanto a primeira consulta rodava
+        nova = asyncio.create_task(cache.obter_ou_carregar("k", carregar))
+        await asyncio.sleep(0)
+        liberar.set()
+        resultados = await antiga, await nova
+        return cache, resultados
+
+    cache, resultados = asyncio.run(cenario())
+    assert resultados == ("velho", "novo")
+    assert cache.coalescidos == 0
+    assert cache.get("k") == "novo" and not cache._pendentes
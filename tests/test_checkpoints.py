@@ -0,0 +1,167 @@
+import asyncio
+import queue
+
+import pytest
+
+import buscar_produtoskabum as kabum
+import buscar_produtosmercadolivre as ml
+
+
+class SessaoFalsa:
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def checkpoints(monkeypatch):
+    """Checkpoints em memória no lugar da tabela checkpoints_scraping"""
+    tabela = {}
+    for modulo in (ml, kabum):
+        monkeypatch.setattr(modulo, "ler_checkpoint", lambda s, site, alvo: tabela.get((site, alvo), 0))
+        monkeypatch.setattr(modulo, "gravar_checkpoint", lambda s, site, alvo, pagina: tabela.__setitem__((site, alvo), pagina))
+        monkeypatch.setattr(modulo, "limpar_checkpoint", lambda s, site, alvo: tabela.pop((site, alvo), None))
+    return tabela
+
+
+@pytest.fixture
+def gravados_ml(monkeypatch):
+    """Links gravados pelo persistir_pagina do Mercado Livre, sem banco"""
+    gravados = []
+
+    def upsert(session, origem, itens):
+        gravados.extend(item["link"] for item in itens)
+        return {"inseridos": len(itens), "atualizados": 0, "inalterados": 0, "alterados": list(itens)}
+
+    monkeypatch.setattr(ml, "upsert_produtos", upsert)
+    monkeypatch.setattr(ml, "processar_alteracoes", lambda session, alterados: None)
+    monkeypatch.setattr(ml, "notificar_produtos_atualizados", lambda session, origem: None)
+    monkeypatch.setattr(ml.cache_paginas, "confirmar", lambda session, **versao: None)
+    monkeypatch.setattr(ml.time, "sleep", lambda s: None)
+    return gravados
+
+
+def _itens(pagina: int, quantidade: int = 2) -> list[dict]:
+    return [
+        {"produto": f"p{pagina}-{i}", "preco": 10.0, "link": f"https://ml/{pagina}/{i}", "imagem_url": None}
+        for i in range(quantidade)
+    ]
+
+
+def _paginas_ml(monkeypatch, respostas: dict):
+    def buscar(url):
+        pagina = int(url.rsplit("_Desde_", 1)[1]) // 50 + 1
+        return respostas.get(pagina, ([], None))
+
+    monkeypatch.setattr(ml, "buscar_produtos", buscar)
+
+
+def test_ml_falha_mantem_checkpoint(monkeypatch, checkpoints, gravados_ml):
+    _paginas_ml(monkeypatch, {1: (_itens(1), None), 2: (ml.FALHA, None), 3: (_itens(3), None)})
+    ml.processar_termo("teclado", SessaoFalsa(), limite=100, max_paginas=5)
+    assert checkpoints == {("mercadolivre", "teclado"): 1}
+    assert len(gravados_ml) == 2
+
+
+def test_ml_retoma_do_checkpoint_e_limpa_no_fim(monkeypatch, checkpoints, gravados_ml):
+    checkpoints[("mercadolivre", "teclado")] = 1
+    _paginas_ml(monkeypatch, {1: (_itens(1), None), 2: (_itens(2), None)})
+    ml.processar_termo("teclado", SessaoFalsa(), limite=100, max_paginas=5)
+    assert gravados_ml == ["https://ml/2/0", "https://ml/2/1"]
+    assert checkpoints == {}  # página 3 vazia: o termo terminou
+
+
+def test_ml_pagina_cortada_pelo_limite_nao_avanca_checkpoint(monkeypatch, checkpoints, gravados_ml):
+    _paginas_ml(monkeypatch, {1: (_itens(1), None), 2: (_itens(2), None)})
+    ml.processar_termo("teclado", SessaoFalsa(), limite=3, max_paginas=5)
+    assert len(gravados_ml) == 3
+    assert checkpoints == {("mercadolivre", "teclado"): 1}
+
+
+def test_ml_async_grava_em_ordem_conforme_chega(monkeypatch, checkpoints, gravados_ml):
+    monkeypatch.setattr(ml, "MAX_PAGINAS_POR_TERMO", 3)
+    monkeypatch.setattr(ml.cache_paginas, "cabecalhos_condicionais", lambda url: {})
+    monkeypatch.setattr(ml.cache_paginas, "verificar", lambda url, html: "hash")
+    monkeypatch.setattr(ml, "extrair_itens", lambda html: _itens(int(html)))
+    liberar = {n: asyncio.Event() for n in (1, 2, 3)}
+    ordem = []
+
+    class ClienteFalso:
+        async def get_texto(self, url, headers=None):
+            pagina = int(url.rsplit("_Desde_", 1)[1]) // 50 + 1
+            await liberar[pagina].wait()
+            if pagina == 3:
+                return None, None, {}  # falha de rede
+            return 200, str(pagina), {}
+
+    def persistir(termo, itens, session, limite, pagina=None, versao=None):
+        ordem.append(pagina)
+        checkpoints[("mercadolivre", termo)] = pagina
+        return len(itens)
+
+    monkeypatch.setattr(ml, "persistir_pagina", persistir)
+
+    async def cenario():
+        total = {"inseridos": 0}
+        tarefa = asyncio.create_task(
+            ml.gravar_termo_async(ClienteFalso(), SessaoFalsa(), asyncio.Lock(), "teclado", total, 100)
+        )
+        liberar[2].set()
+        await asyncio.sleep(0.05)
+        assert ordem == []  # a página 2 espera a 1
+        liberar[1].set()
+        await asyncio.sleep(0.05)
+        assert ordem == [1, 2]  # gravadas antes de a 3 chegar
+        liberar[3].set()
+        await tarefa
+        return total
+
+    assert asyncio.run(cenario()) == {"inseridos": 4}
+    assert ordem == [1, 2]
+    assert checkpoints == {("mercadolivre", "teclado"): 2}  # a página 3 falhou
+
+
+def test_kabum_fila_avanca_checkpoint_contiguo_e_mantem_categoria_incompleta(monkeypatch, checkpoints):
+    salvos = []
+
+    def salvar(produtos, checkpoints_lote=None, paginas=()):
+        salvos.append((list(produtos), dict(checkpoints_lote or {})))
+        for base_url, pagina in (checkpoints_lote or {}).items():
+            checkpoints[("kabum", base_url)] = pagina
+
+    monkeypatch.setattr(kabum, "salvar_produtos", salvar)
+    monkeypatch.setattr(kabum, "Session", SessaoFalsa)
+
+    fila: queue.Queue = queue.Queue()
+    fila.put({"link": "a"})
+    fila.put(kabum.PaginaConcluida("cat", 3, None))  # fora de ordem: a 2 ainda não terminou
+    fila.put({"link": "b"})
+    fila.put(kabum.PaginaConcluida("cat", 2, None))
+    fila.put({"link": "c"})
+    fila.put(kabum.PaginaConcluida("cat", 5, None))  # a 4 falhou: o checkpoint para na 3
+    fila.put(None)
+    kabum.gravar_da_fila(fila, tamanho_lote=2, inicios={"cat": 2})
+
+    assert [s[1] for s in salvos] == [{}, {"cat": 3}]
+    assert checkpoints == {("kabum", "cat"): 3}
+
+
+def test_kabum_categoria_concluida_limpa_checkpoint(monkeypatch, checkpoints):
+    monkeypatch.setattr(kabum, "salvar_produtos", lambda produtos, checkpoints_lote=None, paginas=(): None)
+    monkeypatch.setattr(kabum, "Session", SessaoFalsa)
+    checkpoints[("kabum", "cat")] = 4
+
+    fila: queue.Queue = queue.Queue()
+    fila.put(kabum.PaginaConcluida("cat", 5, None))
+    fila.put(kabum.CategoriaConcluida("cat"))
+    fila.put(None)
+    kabum.gravar_da_fila(fila, inicios={"cat": 5})
+    assert checkpoints == {}
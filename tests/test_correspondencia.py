@@ -0,0 +1,108 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import correspondencia as c
+
+# Banco com o database_setup.sql aplicado; sem ele, só os testes puros rodam
+DATABASE_URL_TESTE = os.getenv("HUNTER_TEST_DATABASE_URL")
+
+MONITOR_KABUM = "Monitor Gamer LG UltraGear 27GN650 27 Pol IPS 144Hz"
+MONITOR_ML = "Monitor LG Ultragear 27gn650-b 27'' IPS 144hz 1ms"
+
+
+def test_modelos_ignoram_unidades():
+    tokens = c.tokens_produto(MONITOR_KABUM)
+    assert "27gn650" in c.extrair_modelos(tokens)
+    assert "144hz" not in c.extrair_modelos(tokens)
+
+
+def test_compativeis_exige_modelo_em_comum():
+    a = c.tokens_produto("Monitor LG UltraGear 27GN650 27 IPS")
+    b = c.tokens_produto("Monitor LG UltraGear 27GN750 27 IPS")
+    assert not c.compativeis(a, c.extrair_modelos(a), b, c.extrair_modelos(b))
+    assert c.compativeis(a, c.extrair_modelos(a), a, c.extrair_modelos(a))
+
+
+def test_nomes_parecidos_caem_no_mesmo_balde():
+    tokens = c.tokens_produto(MONITOR_KABUM)
+    parecido = c.tokens_produto(MONITOR_KABUM + " Preto")
+    lsh = c.IndiceLSH()
+    lsh.adicionar(0, c.chaves_lsh(c.assinatura_minhash(tokens), c.extrair_modelos(tokens)))
+    assert lsh.candidatos(c.chaves_lsh(c.assinatura_minhash(parecido), c.extrair_modelos(parecido))) == {0}
+
+
+def test_balde_cheio_no_banco_nao_gera_candidatos():
+    lsh = c.IndiceLSH()
+    lsh.adicionar(0, ["m:27gn650"])
+    lsh.excluir("m:27gn650", c.MAX_BALDE)
+    assert lsh.candidatos(["m:27gn650"]) == set()
+
+
+def test_uniao_recusa_grupos_com_modelos_diferentes():
+    uniao = c.UniaoBusca([frozenset({"27gn650"}), frozenset({"27gn750"}), frozenset()])
+    assert uniao.unir(0, 2)
+    assert not uniao.unir(1, 2)
+    assert uniao.raiz(0) == uniao.raiz(2) != uniao.raiz(1)
+
+
+@pytest.fixture
+def session():
+    if not DATABASE_URL_TESTE:
+        pytest.skip("HUNTER_TEST_DATABASE_URL não definido")
+    engine = create_engine(DATABASE_URL_TESTE)
+    with Session(engine) as s:
+        for tabela in ("grupos_produtos", "baldes_produtos", "produtos_kabum", "produtos_mercadolivre"):
+            s.execute(text(f"DELETE FROM {tabela}"))
+        yield s
+        s.rollback()
+    engine.dispose()
+
+
+def _inserir(session, tabela: str, nome: str) -> int:
+    return session.execute(
+        text(f"INSERT INTO {tabela} (nome, preco, link) VALUES (:nome, 1000, :link) RETURNING id"),
+        {"nome": nome, "link": f"https://exemplo/{tabela}/{nome}"},
+    ).scalar()
+
+
+def _grupos(session) -> list[set]:
+    rows = session.execute(text("SELECT grupo_id, origem, produto_id FROM grupos_produtos_membros")).all()
+    grupos: dict[int, set] = {}
+    for grupo_id, origem, produto_id in rows:
+        grupos.setdefault(grupo_id, set()).add((origem, produto_id))
+    return list(grupos.values())
+
+
+def test_produto_sozinho_nao_cria_grupo_e_e_achado_depois(session):
+    kabum = _inserir(session, "produtos_kabum", MONITOR_KABUM)
+    _inserir(session, "produtos_kabum", "Teclado Mecânico Redragon Kumara K552")
+    assert c.agrupar_novos(session) == {"novos": 2, "grupos_criados": 0, "grupos_fundidos": 0}
+    assert _grupos(session) == []
+
+    # Só o novo tem a assinatura calculada; o antigo vem do balde que ele acerta
+    ml = _inserir(session, "produtos_mercadolivre", MONITOR_ML)
+    assert c.agrupar_novos(session) == {"novos": 1, "grupos_criados": 1, "grupos_fundidos": 0}
+    assert _grupos(session) == [{("kabum", kabum), ("mercadolivre", ml)}]
+    assert c.agrupar_novos(session)["novos"] == 0
+
+
+def test_novo_produto_funde_grupos(session):
+    a = _inserir(session, "produtos_kabum", "Mouse Logitech G502 Hero RGB 25600 DPI")
+    b = _inserir(session, "produtos_mercadolivre", "Mouse Gamer Logitech G502 Hero RGB 25600 DPI")
+    c.agrupar_novos(session)
+    d = _inserir(session, "produtos_kabum", "Mouse Logitech G502 Hero RGB 25600 DPI Preto")
+    assert c.agrupar_novos(session)["grupos_criados"] == 0
+    assert _grupos(session) == [{("kabum", a), ("mercadolivre", b), ("kabum", d)}]
+
+
+def test_grupo_de_um_produto_e_desfeito(session):
+    a = _inserir(session, "produtos_kabum", "Mouse Logitech G502 Hero RGB 25600 DPI")
+    _inserir(session, "produtos_mercadolivre", "Mouse Gamer Logitech G502 Hero RGB 25600 DPI")
+    c.agrupar_novos(session)
+    session.execute(text("DELETE FROM produtos_mercadolivre"))
+    c.agrupar_novos(session)
+    assert _grupos(session) == []
+    assert session.execute(text("SELECT count(*) FROM baldes_produtos WHERE produto_id = :id"), {"id": a}).scalar()
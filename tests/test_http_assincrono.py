@@ -0,0 +1,30 @@
+import asyncio
+
+from aiohttp import web
+
+from http_assincrono import ClienteHttp
+
+
+def test_headers_da_resposta_sem_distincao_de_maiusculas():
+    async def cenario():
+        async def pagina(request):
+            # Como chegam de um proxy HTTP/2: nomes em minúsculas
+            return web.Response(text="ok", headers={"etag": '"abc"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+        app = web.Application()
+        app.router.add_get("/", pagina)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        try:
+            async with ClienteHttp({}, taxa=100, site="teste") as cliente:
+                return await cliente.get_texto(f"http://127.0.0.1:{porta}/")
+        finally:
+            await runner.cleanup()
+
+    status, corpo, headers = asyncio.run(cenario())
+    assert (status, corpo) == (200, "ok")
+    assert headers.get("ETag") == '"abc"'
+    assert headers.get("Last-Modified") == "Mon, 01 Jan 2024 00:00:00 GMT"
@@ -0,0 +1,23 @@
+import importlib
+
+from prometheus_client import REGISTRY
+
+import metricas
+from cache import CacheTTL
+
+
+def test_registrar_coletor_de_novo_nao_duplica_series():
+    cache = CacheTTL()
+    cache.set("a", 1)
+    cache.get("a")
+    metricas.registrar_coletor(pools={}, caches={"teste": cache})
+    metricas.registrar_coletor(pools={}, caches={"teste": cache})  # ex.: segundo startup
+    assert REGISTRY.get_sample_value("hunter_cache_consultas_total", {"cache": "teste", "resultado": "hit"}) == 1
+
+
+def test_nome_consulta():
+    assert metricas.nome_consulta("/* login */ SELECT id FROM usuarios") == "login"
+    assert metricas.nome_consulta("\n  SELECT * FROM alertas_preco WHERE id = $1") == "select_alertas_preco"
+    assert metricas.nome_consulta("INSERT INTO sessoes (usuario_id) VALUES ($1)") == "insert_sessoes"
+    assert metricas.nome_consulta("UPDATE refresh_tokens SET usado_em = NOW()") == "update_refresh_tokens"
+    assert metricas.nome_consulta("BEGIN;") == "transacao"
@@ -0,0 +1,49 @@
+import random
+
+from motor_alertas import IndiceAlertas, tokenizar
+
+
+def _produto(nome: str, preco: float, produto_id: int = 1) -> dict:
+    return {"origem": "kabum", "produto_id": produto_id, "nome": nome, "preco": preco}
+
+
+def _disparos(indice: IndiceAlertas, produtos) -> set[tuple[int, int]]:
+    return {(d["alerta_id"], d["produto_id"]) for d in indice.corresponder(produtos)}
+
+
+def test_tokenizar_remove_acentos_e_pontuacao():
+    assert tokenizar("Monitor Gamer 27'' Ação-Rápida") == ["monitor", "gamer", "27", "acao", "rapida"]
+
+
+def test_dispara_com_todos_os_tokens_e_preco_ate_o_alvo():
+    indice = IndiceAlertas([(1, 10, "monitor lg 27gn650", 1000), (2, 11, "monitor", 500)])
+    assert _disparos(indice, [_produto("Monitor LG UltraGear 27GN650", 1000)]) == {(1, 1)}  # alvo igual dispara
+    assert _disparos(indice, [_produto("Monitor LG UltraGear 27GN650", 1000.01)]) == set()
+    assert _disparos(indice, [_produto("Monitor LG UltraGear", 400)]) == {(2, 1)}  # falta 27gn650 no alerta 1
+
+
+def test_alerta_sem_tokens_e_ignorado():
+    indice = IndiceAlertas([(1, 10, "!!!", 1000)])
+    assert len(indice) == 0
+    assert _disparos(indice, [_produto("Qualquer coisa", 1)]) == set()
+
+
+def test_indice_equivale_a_comparar_tudo_com_tudo():
+    rng = random.Random(8)
+    vocabulario = ["monitor", "lg", "samsung", "27", "24", "ips", "gamer", "144hz", "mouse", "teclado", "rgb"]
+    alertas = [
+        (i, i % 7, " ".join(rng.sample(vocabulario, rng.randint(1, 3))), rng.choice([100, 500, 1000, 2000]))
+        for i in range(300)
+    ]
+    produtos = [
+        _produto(" ".join(rng.sample(vocabulario, rng.randint(2, 6))), rng.uniform(50, 2500), i)
+        for i in range(300)
+    ]
+    esperado = {
+        (alerta_id, p["produto_id"])
+        for alerta_id, _, termo, alvo in alertas
+        for p in produtos
+        if set(tokenizar(termo)) <= set(tokenizar(p["nome"])) and p["preco"] <= alvo
+    }
+    assert esperado
+    assert _disparos(IndiceAlertas(alertas), produtos) == esperado
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+import sessoes
+
+# Banco com o database_setup.sql aplicado; sem ele, só os testes puros rodam
+DATABASE_URL_TESTE = os.getenv("HUNTER_TEST_DATABASE_URL")
+
+
+def test_refresh_invalido_e_uma_excecao_nova_por_falha():
+    assert sessoes.refresh_invalido() is not sessoes.refresh_invalido()
+
+
+class PoolFalso:
+    """pool.acquire() de asyncpg devolvendo sempre as mesmas linhas"""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def acquire(self):
+        pool = self
+
+        class Conexao:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def fetch(self, query, *args):
+                return [{"id": i} for i in pool.ids]
+
+        return Conexao()
+
+
+def test_lista_revogacao_mantem_revogacoes_locais_ate_a_recarga_trazer():
+    lista = auth.ListaRevogacao()
+    lista.revogar(7)  # gravada no banco depois da leitura da recarga
+    asyncio.run(lista.recarregar(PoolFalso([3])))
+    assert lista.revogada(3) and lista.revogada(7)
+    assert not lista.revogada(4) and not lista.revogada(None)
+
+
+async def _fluxo_sessao():
+    import asyncpg
+
+    conn = await asyncpg.connect(DATABASE_URL_TESTE)
+    transacao = conn.transaction()
+    await transacao.start()
+    try:
+        usuario_id = await conn.fetchval(
+            "INSERT INTO usuarios (nome, email, senha) VALUES ('A', 'sessao@hunter.com', 'x') RETURNING id"
+        )
+        primeira = await sessoes.abrir_sessao(conn, usuario_id, "sessao@hunter.com")
+        sid = jwt.get_unverified_claims(primeira["access_token"])["sid"]
+
+        segunda = await sessoes.renovar_sessao(conn, primeira["refresh_token"])
+        assert segunda["refresh_token"] != primeira["refresh_token"]
+        assert jwt.get_unverified_claims(segunda["access_token"])["sid"] == sid
+        assert not auth.revogacoes.revogada(sid)
+
+        # Reuso do refresh já trocado: a sessão inteira cai, inclusive o par novo
+        with pytest.raises(HTTPException):
+            await sessoes.renovar_sessao(conn, primeira["refresh_token"])
+        assert auth.revogacoes.revogada(sid)
+        with pytest.raises(HTTPException):
+            await sessoes.renovar_sessao(conn, segunda["refresh_token"])
+        return await conn.fetchval("SELECT motivo FROM sessoes WHERE id = $1", sid)
+    finally:
+        await transacao.rollback()
+        await conn.close()
+
+
+def test_rotacao_e_revogacao_por_reuso():
+    if not DATABASE_URL_TESTE:
+        pytest.skip("HUNTER_TEST_DATABASE_URL não definido")
+    assert asyncio.run(_fluxo_sessao()) == "reuso"